@@ -0,0 +1,123 @@
+import os
+import re
+import pandas as pd
+import numpy as np
+
+# Column layout of Binance aggTrades files; older spot files have no header row
+AGGTRADES_COLUMNS = ['agg_trade_id', 'price', 'quantity', 'first_trade_id', 'last_trade_id', 'transact_time', 'is_buyer_maker', 'is_best_match']
+
+def _has_header(filepath):
+    first_row = pd.read_csv(filepath, header=None, nrows=1)
+    return not str(first_row.iloc[0, 0]).strip().isdigit()
+
+def _time_unit(transact_time):
+    # Binance switched spot transact_time from milliseconds to microseconds in 2025
+    return 'us' if transact_time >= 10**14 else 'ms'
+
+def processed_filename(filepath):
+    """
+    Name of the processed file data_merging reads for a raw aggTrades file, e.g.
+    SOLUSDT-aggTrades-2023-03.zip -> processed_SOLUSDT-aggTrades-2023-03.csv.
+    """
+    match = re.match(r"(.+-aggTrades-\d{4}-\d{2})", os.path.basename(filepath))
+    if not match:
+        raise ValueError(f"Cannot read the symbol and month from '{filepath}', expected <SYMBOL>-aggTrades-YYYY-MM")
+    return f"processed_{match.group(1)}.csv"
+
+def aggregate_aggtrades(filepath, output_directory, bar_size='1s', chunksize=5_000_000):
+    """
+    Stream a raw Binance aggTrades file chunk by chunk and write its volume-weighted average
+    price per bar, in the processed_<SYMBOL>-aggTrades-YYYY-MM.csv format data_merging reads.
+
+    Each chunk is aggregated with a vectorized group-by on the bar of every trade. The last
+    bar of a chunk may continue in the next chunk, so its price x quantity and quantity sums
+    are carried over instead of written. Memory is bounded by the chunk size, not the file size.
+
+    Parameters:
+    - filepath: Raw aggTrades file (.csv or the .zip Binance publishes).
+    - output_directory: Directory to write the processed file to.
+    - bar_size: Bar length, e.g. '1ms', '100ms', '1s' or '2s'.
+    - chunksize: Number of trades read at a time.
+
+    Returns:
+    - The path of the processed file.
+    """
+    bar_ns = pd.Timedelta(bar_size).value
+    if bar_ns <= 0:
+        raise ValueError(f"bar_size must be positive, got '{bar_size}'")
+    # Sub-second bars always carry fractional seconds so every row has the same timestamp format
+    date_format = '%Y-%m-%d %H:%M:%S.%f' if bar_ns % 10**9 else '%Y-%m-%d %H:%M:%S'
+
+    os.makedirs(output_directory, exist_ok=True)
+    output_path = os.path.join(output_directory, processed_filename(filepath))
+    header = 0 if _has_header(filepath) else None
+    reader = pd.read_csv(filepath, header=header, names=None if header == 0 else AGGTRADES_COLUMNS,
+                         usecols=['price', 'quantity', 'transact_time'], chunksize=chunksize)
+
+    multiplier = None
+    carry = None  # (bar, price x quantity sum, quantity sum) of the last, possibly unfinished bar
+    with open(output_path, 'w', newline='') as output:
+        pd.DataFrame(columns=['timestamp', 'weighted_avg_price']).to_csv(output, index=False)
+
+        for chunk in reader:
+            if len(chunk) == 0:
+                continue
+            transact_time = chunk['transact_time'].values.astype('int64')
+            if multiplier is None:
+                multiplier = 10**6 if _time_unit(transact_time[0]) == 'ms' else 10**3
+            bars = transact_time * multiplier // bar_ns
+            if np.any(np.diff(bars) < 0) or (carry is not None and bars[0] < carry[0]):
+                raise ValueError(f"Trades in {filepath} are not in time order")
+
+            price = chunk['price'].values.astype('float64')
+            quantity = chunk['quantity'].values.astype('float64')
+
+            # Bars are sorted, so each bar is one contiguous run of trades
+            starts = np.flatnonzero(np.r_[True, bars[1:] != bars[:-1]])
+            bar_ids = bars[starts]
+            price_quantity = np.add.reduceat(price * quantity, starts)
+            quantity_sums = np.add.reduceat(quantity, starts)
+
+            if carry is not None:
+                if bar_ids[0] == carry[0]:
+                    price_quantity[0] += carry[1]
+                    quantity_sums[0] += carry[2]
+                else:
+                    bar_ids = np.r_[carry[0], bar_ids]
+                    price_quantity = np.r_[carry[1], price_quantity]
+                    quantity_sums = np.r_[carry[2], quantity_sums]
+            carry = (bar_ids[-1], price_quantity[-1], quantity_sums[-1])
+
+            _write_bars(output, bar_ids[:-1], price_quantity[:-1], quantity_sums[:-1], bar_ns, date_format)
+
+        if carry is not None:
+            _write_bars(output, np.array([carry[0]]), np.array([carry[1]]), np.array([carry[2]]), bar_ns, date_format)
+
+    print(f"CSV file saved: {output_path}")
+    return output_path
+
+def _write_bars(output, bar_ids, price_quantity, quantity_sums, bar_ns, date_format):
+    if len(bar_ids) == 0:
+        return
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_avg_price = price_quantity / quantity_sums
+    bars_df = pd.DataFrame({'timestamp': pd.to_datetime(bar_ids * bar_ns, unit='ns'), 'weighted_avg_price': weighted_avg_price})
+    bars_df.to_csv(output, header=False, index=False, date_format=date_format)
+
+def aggregate_directory(input_directory, output_directory, symbols, years, months, bar_size='1s', chunksize=5_000_000):
+    """
+    Aggregate the raw aggTrades files of several symbols and months, skipping missing ones.
+    Raw files are looked up as <SYMBOL>-aggTrades-YYYY-MM.zip, then .csv.
+    """
+    outputs = []
+    for year in years:
+        for month in months:
+            for symbol in symbols:
+                for extension in ('zip', 'csv'):
+                    filepath = os.path.join(input_directory, f"{symbol}-aggTrades-{year}-{month:02d}.{extension}")
+                    if os.path.exists(filepath):
+                        outputs.append(aggregate_aggtrades(filepath, output_directory, bar_size, chunksize))
+                        break
+                else:
+                    print(f"File does not exist: {symbol}-aggTrades-{year}-{month:02d}")
+    return outputs
@@ -0,0 +1,296 @@
+import os
+import io
+import gc
+import sys
+import json
+import time
+import argparse
+import warnings
+import platform
+import tracemalloc
+import contextlib
+import pandas as pd
+import numpy as np
+import data_merging
+import data_cleaning
+import trading_signal_analysis
+import holding_position_analysis
+import data_visualization
+import instrumentation
+import result_cache
+
+# (duration, resolution) cases run when none are given on the command line
+DEFAULT_CASES = [('1D', '1s'), ('7D', '1s'), ('30D', '1s'), ('1h', '1ms')]
+
+# Stages timed for every case, in pipeline order
+STAGES = ['merge', 'spread', 'signals', 'holding', 'spread_statistics']
+
+# Variables that would make the timings measure cache reads, profilers or report writing instead of the stages
+ISOLATED_ENV = [result_cache.CACHE_ENV, instrumentation.PROFILE_ENV, instrumentation.REPORT_ENV]
+
+def generate_prices(duration='1D', resolution='1s', start='2023-03-01', seed=0, spot_price=20.0, volatility=2e-4,
+                    basis_std=1.5e-3, basis_half_life='10min', missing_ratio=0.05):
+    """
+    Generate synthetic spot and future price series with a mean-reverting basis.
+
+    The spot follows a geometric random walk and the future is spot * (1 + basis), with the
+    basis an Ornstein-Uhlenbeck process. A fraction of the rows of each leg is dropped
+    independently, so the merge stage has gaps to fill.
+
+    Parameters:
+    - duration: Length of the series, e.g. '1D', '30D' or '365D'.
+    - resolution: Time between rows, e.g. '1s' or '1ms'.
+    - start: First timestamp.
+    - seed: Random seed.
+    - spot_price: Initial spot price.
+    - volatility: Standard deviation of the spot log return per second.
+    - basis_std: Stationary standard deviation of the basis.
+    - basis_half_life: Time for the basis to revert half way to zero.
+    - missing_ratio: Fraction of rows dropped from each leg.
+
+    Returns:
+    - A tuple of (spot_df, future_df), each with 'timestamp' and 'weighted_avg_price' columns.
+    """
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(resolution)
+    rows = int(pd.Timedelta(duration) / step)
+    step_seconds = step.total_seconds()
+
+    timestamps = pd.Timestamp(start) + step * np.arange(rows)
+    spot = spot_price * np.exp(np.cumsum(rng.normal(0, volatility * np.sqrt(step_seconds), rows)))
+
+    # AR(1) form of the Ornstein-Uhlenbeck basis, evaluated block by block with closed-form sums
+    phi = 0.5 ** (step / pd.Timedelta(basis_half_life))
+    shocks = rng.normal(0, basis_std * np.sqrt(1 - phi ** 2), rows)
+    basis = np.empty(rows)
+    block = 1024
+    powers = phi ** np.arange(block)
+    level = 0.0
+    for first in range(0, rows, block):
+        e = shocks[first:first + block]
+        p = powers[:len(e)]
+        basis[first:first + len(e)] = p * (level + np.cumsum(e / p))
+        level = basis[first + len(e) - 1] * phi
+    future = spot * (1 + basis)
+
+    spot_keep = rng.random(rows) >= missing_ratio
+    future_keep = rng.random(rows) >= missing_ratio
+    spot_df = pd.DataFrame({'timestamp': timestamps[spot_keep], 'weighted_avg_price': spot[spot_keep]})
+    future_df = pd.DataFrame({'timestamp': timestamps[future_keep], 'weighted_avg_price': future[future_keep]})
+    return spot_df, future_df
+
+def write_processed_files(spot_df, future_df, spot_directory, future_directory, symbol='BENCHUSDT'):
+    """
+    Write generated prices as monthly processed_<SYMBOL>-aggTrades-YYYY-MM.csv files.
+
+    Returns:
+    - The list of (year, month) written.
+    """
+    os.makedirs(spot_directory, exist_ok=True)
+    os.makedirs(future_directory, exist_ok=True)
+    # Sub-second rows always carry fractional seconds so every row has the same timestamp format
+    sub_second = (spot_df['timestamp'].values.astype('datetime64[ns]').astype('int64') % 10**9).any()
+    date_format = '%Y-%m-%d %H:%M:%S.%f' if sub_second else '%Y-%m-%d %H:%M:%S'
+
+    months = []
+    for directory, df in ((spot_directory, spot_df), (future_directory, future_df)):
+        for (year, month), month_df in df.groupby([df['timestamp'].dt.year, df['timestamp'].dt.month]):
+            month_df.to_csv(os.path.join(directory, f"processed_{symbol}-aggTrades-{year}-{month:02d}.csv"), index=False, date_format=date_format)
+            months.append((year, month))
+    return sorted(set(months))
+
+def measure(function, *args, measure_memory=True, **kwargs):
+    """
+    Time a call and, in a second call under tracemalloc, record its peak traced memory.
+
+    Returns:
+    - A tuple of (result, seconds, peak_memory_mb). peak_memory_mb is None when memory is not measured.
+    """
+    gc.collect()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        # Stages print progress and warn on empty statistics; neither belongs in the timings
+        warnings.simplefilter('ignore', RuntimeWarning)
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        peak_memory_mb = None
+        if measure_memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                function(*args, **kwargs)
+                peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            finally:
+                tracemalloc.stop()
+    return result, seconds, peak_memory_mb
+
+@contextlib.contextmanager
+def _isolated_environment():
+    saved = {name: os.environ.pop(name) for name in ISOLATED_ENV if name in os.environ}
+    try:
+        yield
+    finally:
+        os.environ.update(saved)
+
+def _record(seconds, rows, peak_memory_mb):
+    return {'seconds': seconds, 'rows': rows, 'rows_per_second': rows / seconds if seconds > 0 else None, 'peak_memory_mb': peak_memory_mb}
+
+def run_case(duration, resolution, work_directory, mean_n=900, threshold=None, seed=0, measure_memory=True):
+    """
+    Generate one synthetic dataset and time every pipeline stage on it.
+
+    The stages run without the result cache, profilers and run reports (ISOLATED_ENV), so
+    both passes of measure run the stage itself. The holding stage is skipped when the case
+    has no more than holding_position_analysis.WARM_UP_ROWS rows, since no position can open.
+
+    Parameters:
+    - duration, resolution: Size of the dataset, see generate_prices.
+    - work_directory: Directory for the generated and intermediate files.
+    - mean_n: Rolling mean window in rows for the backtests.
+    - threshold: Spread threshold for the backtests. Defaults to twice the standard deviation of the
+                 spread around its rolling mean, so every resolution produces signals.
+    - seed: Random seed of the generator.
+    - measure_memory: Also run every stage under tracemalloc to record its peak memory.
+
+    Returns:
+    - A dictionary with the number of generated rows and the timings of every stage.
+    """
+    case_directory = os.path.join(work_directory, f"{duration}_{resolution}")
+    spot_directory = os.path.join(case_directory, 'spot')
+    future_directory = os.path.join(case_directory, 'future')
+    merged_directory = os.path.join(case_directory, 'merged')
+    spread_directory = os.path.join(case_directory, 'spread')
+    signal_directory = os.path.join(case_directory, 'signals')
+    for directory in (merged_directory, spread_directory, signal_directory):
+        os.makedirs(directory, exist_ok=True)
+
+    spot_df, future_df = generate_prices(duration, resolution, seed=seed)
+    months = write_processed_files(spot_df, future_df, spot_directory, future_directory)
+    del spot_df, future_df
+    years = sorted({year for year, _ in months})
+    month_numbers = sorted({month for _, month in months})
+
+    stages = {}
+    with _isolated_environment():
+        _, seconds, memory = measure(data_merging.read_and_merge_csv_files, spot_directory, future_directory, ['BENCHUSDT'], ['BENCHUSDT'],
+                                     years, month_numbers, merged_directory, measure_memory=measure_memory)
+        merged_rows = sum(len(pd.read_csv(os.path.join(merged_directory, f"BENCHUSDT-BENCHUSDT-{year}-{month:02d}.csv"), usecols=['timestamp'])) for year, month in months)
+        stages['merge'] = _record(seconds, merged_rows, memory)
+
+        _, seconds, memory = measure(data_cleaning.calculate_spread, merged_directory, 'BENCHUSDT', 'BENCHUSDT', spread_directory, measure_memory=measure_memory)
+        stages['spread'] = _record(seconds, merged_rows, memory)
+
+        spreads_df = pd.read_csv(os.path.join(spread_directory, 'spreads_BENCHUSDT_BENCHUSDT.csv'))
+        spreads_df['timestamp'] = pd.to_datetime(spreads_df['timestamp'])
+        rows = len(spreads_df)
+        if threshold is None:
+            spreads = spreads_df['spread']
+            threshold = 2 * float((spreads - spreads.rolling(window=mean_n).mean()).std())
+
+        _, seconds, memory = measure(lambda: trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+            mean_n, spreads_df.copy(), threshold, 'benchmark', signal_directory, show_plot=False, cache=False), measure_memory=measure_memory)
+        stages['signals'] = _record(seconds, rows, memory)
+
+        if rows > holding_position_analysis.WARM_UP_ROWS:
+            _, seconds, memory = measure(lambda: holding_position_analysis.backtest_arbitrage_strategy_hedging_ratio_version_rolling(
+                mean_n, spreads_df.copy(), threshold, 'benchmark', show_plot=False), measure_memory=measure_memory)
+            stages['holding'] = _record(seconds, rows, memory)
+        else:
+            # Without a record, compare_to_baseline skips the stage instead of comparing a run that trades nothing
+            stages['holding'] = {'seconds': None, 'rows': rows, 'rows_per_second': None, 'peak_memory_mb': None,
+                                 'skipped': f"{rows} rows, no position opens before row {holding_position_analysis.WARM_UP_ROWS}"}
+
+        _, seconds, memory = measure(data_visualization.calculate_spread_statistics, spreads_df, show_plot=False, measure_memory=measure_memory)
+        stages['spread_statistics'] = _record(seconds, rows, memory)
+
+    return {'duration': duration, 'resolution': resolution, 'rows': rows, 'threshold': threshold, 'stages': stages}
+
+def run_benchmarks(cases=None, work_directory='benchmark_data', mean_n=900, threshold=None, measure_memory=True):
+    """
+    Run every case and collect the results together with the environment they ran in.
+    """
+    results = {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                        'machine': platform.machine(), 'processor': platform.processor()},
+        'cases': {},
+    }
+    for duration, resolution in cases or DEFAULT_CASES:
+        name = f"{duration}@{resolution}"
+        print(f"Running: {name}")
+        results['cases'][name] = run_case(duration, resolution, work_directory, mean_n, threshold, measure_memory=measure_memory)
+        for stage, record in results['cases'][name]['stages'].items():
+            if record.get('skipped'):
+                print(f"  {stage}: skipped, {record['skipped']}")
+                continue
+            memory = '' if record['peak_memory_mb'] is None else f", peak {record['peak_memory_mb']:.1f} MB"
+            print(f"  {stage}: {record['seconds']:.3f}s, {record['rows_per_second']:,.0f} rows/s{memory}")
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Compare results to a baseline and list the stages that regressed.
+
+    A stage regresses when its throughput drops, or its peak memory grows, by more than
+    `tolerance` (a fraction) compared to the baseline. Cases or stages missing from either
+    side are skipped.
+
+    Returns:
+    - A list of human-readable regression messages (empty if none).
+    """
+    regressions = []
+    for name, case in results['cases'].items():
+        baseline_case = baseline.get('cases', {}).get(name)
+        if baseline_case is None:
+            continue
+        for stage, record in case['stages'].items():
+            baseline_record = baseline_case['stages'].get(stage)
+            if baseline_record is None:
+                continue
+            if record['rows_per_second'] and baseline_record['rows_per_second']:
+                ratio = record['rows_per_second'] / baseline_record['rows_per_second']
+                if ratio < 1 - tolerance:
+                    regressions.append(f"{name} {stage}: throughput {ratio:.0%} of baseline")
+            if record['peak_memory_mb'] and baseline_record['peak_memory_mb']:
+                ratio = record['peak_memory_mb'] / baseline_record['peak_memory_mb']
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{name} {stage}: peak memory {ratio:.0%} of baseline")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every pipeline stage on synthetic spot/future data.')
+    parser.add_argument('--cases', nargs='+', metavar='DURATION@RESOLUTION',
+                        help="cases to run, e.g. 1D@1s 365D@1s 1h@1ms (default: %(default)s)",
+                        default=[f"{duration}@{resolution}" for duration, resolution in DEFAULT_CASES])
+    parser.add_argument('--work-directory', default='benchmark_data', help='directory for generated data')
+    parser.add_argument('--mean-n', type=int, default=900, help='rolling mean window in rows')
+    parser.add_argument('--threshold', type=float, help='spread threshold (default: twice the spread deviation from its rolling mean)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', default='benchmark_results.json', help='file to write the results to')
+    parser.add_argument('--baseline', help='baseline results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results to the baseline file')
+    args = parser.parse_args(argv)
+
+    cases = [tuple(case.split('@')) for case in args.cases]
+    results = run_benchmarks(cases, args.work_directory, args.mean_n, args.threshold, measure_memory=not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved: {args.output}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print('No regressions against the baseline')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,18 @@
 import pandas as pd
+import numpy as np
 import os
 import glob
-import gc  # Garbage collection module
+import shutil
+import storage
+import instrumentation
+
+@instrumentation.instrumented('spread', 'dumping_directory')
+def calculate_spread(merged_directory, spot_name, future_name, dumping_directory, storage_format='csv', streaming=True, chunksize=1_000_000):
+    if storage_format != 'csv':
+        return calculate_spread_columnar(merged_directory, spot_name, future_name, dumping_directory, storage_format)
+    if streaming:
+        return calculate_spread_streaming(merged_directory, spot_name, future_name, dumping_directory, chunksize)
 
-def calculate_spread(merged_directory, spot_name, future_name, dumping_directory):
-    
     file_pattern = f"{spot_name}-{future_name}-????-??.csv" # pattern to match CSV files
 
     # Initialize an empty list to store all tuples
@@ -20,6 +28,7 @@ def calculate_spread(merged_directory, spot_name, future_name, dumping_directory
     for csv_file in csv_files:
         df = pd.read_csv(csv_file)
         print(f"Processing: {csv_file}")
+        instrumentation.add_rows(len(df))
         
         # Ensure 'timestamp' is in the correct datetime format
         df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -33,7 +42,7 @@ def calculate_spread(merged_directory, spot_name, future_name, dumping_directory
 
         # Delete the DataFrame and manually trigger garbage collection
         del df
-        gc.collect()
+        instrumentation.collect_garbage('calculate_spread: merged file processed')
         print(f"Deleted: {csv_file}")
 
     # Store tuples by timestamp
@@ -52,6 +61,157 @@ def calculate_spread(merged_directory, spot_name, future_name, dumping_directory
 
     # After saving, delete the list and the DataFrame to free up memory
     del all_spreads, df_spreads
-    gc.collect()
+    instrumentation.collect_garbage('calculate_spread: spread file saved')
     print(f"Deleted: {csv_file}\n")
-    return
\ No newline at end of file
+    return
+
+def merged_files_in_order(merged_directory, spot_name, future_name):
+    """
+    List the monthly merged CSV files of a pair in chronological order, based on the
+    YYYY-MM at the end of their filename.
+    """
+    full_pattern = os.path.join(merged_directory, f"{spot_name}-{future_name}-????-??.csv")
+    return sorted(glob.glob(full_pattern), key=lambda csv_file: os.path.basename(csv_file)[-11:-4])
+
+# Units of np.datetime_as_string from the coarsest to the finest, with their length in nanoseconds
+TIMESTAMP_UNITS = [('D', 86_400 * 10**9), ('s', 10**9), ('ms', 10**6), ('us', 10**3), ('ns', 1)]
+
+def timestamp_unit(timestamps, unit='D'):
+    """
+    Coarsest unit that writes every timestamp exactly, and at least as fine as `unit`.
+
+    This is how to_csv picks the format of a datetime column (dates only, seconds, then
+    milli-, micro- or nanoseconds), so a column written chunk by chunk with the unit of
+    all its rows gives the same file as a single to_csv call.
+    """
+    nanoseconds = np.asarray(timestamps).astype('datetime64[ns]')
+    nanoseconds = nanoseconds[~np.isnat(nanoseconds)].astype('int64')
+    names = [name for name, _ in TIMESTAMP_UNITS]
+    for name, length in TIMESTAMP_UNITS[names.index(unit):]:
+        if not np.any(nanoseconds % length):
+            return name
+    return 'ns'
+
+def finer_unit(unit, other):
+    """
+    The finer of two timestamp units.
+    """
+    names = [name for name, _ in TIMESTAMP_UNITS]
+    return max(unit, other, key=names.index)
+
+def format_timestamps(timestamps, unit):
+    """
+    Timestamps as the strings to_csv writes for a datetime column of that unit; NaT is empty.
+    """
+    timestamps = np.asarray(timestamps).astype('datetime64[ns]')
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=object)
+    strings = np.char.replace(np.datetime_as_string(timestamps, unit=unit), 'T', ' ').astype(object)
+    strings[np.isnat(timestamps)] = ''
+    return strings
+
+def merged_timestamp_unit(csv_files, chunksize=1_000_000, unit='D'):
+    """
+    Timestamp unit (see timestamp_unit) of every row of merged CSV files, reading only
+    their timestamp column.
+    """
+    for csv_file in csv_files:
+        for chunk in pd.read_csv(csv_file, usecols=['timestamp'], chunksize=chunksize):
+            unit = timestamp_unit(pd.to_datetime(chunk['timestamp']).values, unit)
+    return unit
+
+def calculate_spread_streaming(merged_directory, spot_name, future_name, dumping_directory, chunksize=1_000_000):
+    """
+    Calculate the spread month by month and chunk by chunk, appending every chunk to the
+    output CSV as soon as it is computed, so memory stays flat as months are added.
+
+    The merged files are sorted by timestamp and do not overlap, so processing them in
+    chronological order gives the same file as sorting the whole history in memory.
+
+    Parameters:
+    - merged_directory: Directory with the <spot>-<future>-YYYY-MM.csv merged files.
+    - spot_name: Spot symbol, e.g. 'SOLUSDT'.
+    - future_name: Future symbol, e.g. 'SOLUSDT'.
+    - dumping_directory: Directory to write spreads_<spot>_<future>.csv to.
+    - chunksize: Number of rows read and written at a time.
+    """
+    filename = os.path.join(dumping_directory, f"spreads_{spot_name}_{future_name}.csv")
+    csv_files = merged_files_in_order(merged_directory, spot_name, future_name)
+    # One timestamp format for the whole file, as the in-memory path writes it
+    unit = merged_timestamp_unit(csv_files, chunksize)
+
+    with open(filename, 'w', newline='') as output:
+        # Header first, so that a pair without merged files still gets an (empty) spread file
+        pd.DataFrame(columns=['timestamp', 'spread']).to_csv(output, index=False)
+        append_spreads(csv_files, output, chunksize, unit=unit)
+
+    print(f"Saved: {filename}")
+    return
+
+def append_spreads(csv_files, output, chunksize=1_000_000, last_timestamp=None, unit=None):
+    """
+    Compute the spread of merged CSV files chunk by chunk and append the rows to an open
+    spread CSV file, without a header.
+
+    Parameters:
+    - csv_files: Merged files in chronological order.
+    - output: Text file handle the rows are written to.
+    - chunksize: Number of rows read and written at a time.
+    - last_timestamp: Timestamp of the last row already in the output, if any.
+    - unit: Timestamp unit of the whole output file (see timestamp_unit); by default the
+            unit of csv_files, found with an extra pass over their timestamps.
+
+    Returns:
+    - The timestamp of the last row written (or last_timestamp if nothing was written).
+    """
+    columns = ['timestamp', 'weighted_avg_price_spot', 'weighted_avg_price_future']
+    csv_files = list(csv_files)
+    if unit is None:
+        unit = merged_timestamp_unit(csv_files, chunksize)
+    for csv_file in csv_files:
+        print(f"Processing: {csv_file}")
+        for chunk in pd.read_csv(csv_file, usecols=columns, chunksize=chunksize):
+            timestamps = pd.to_datetime(chunk['timestamp'])
+            if len(timestamps) == 0:
+                continue
+            if not timestamps.is_monotonic_increasing or (last_timestamp is not None and timestamps.iloc[0] < last_timestamp):
+                raise ValueError(f"Timestamps in {csv_file} are not in chronological order; use streaming=False to sort in memory")
+            last_timestamp = timestamps.iloc[-1]
+            instrumentation.add_rows(len(chunk))
+
+            # (future - spot) / spot
+            spot = chunk['weighted_avg_price_spot'].values
+            future = chunk['weighted_avg_price_future'].values
+            pd.DataFrame({'timestamp': format_timestamps(timestamps.values, unit), 'spread': (future - spot) / spot}).to_csv(output, header=False, index=False)
+    return last_timestamp
+
+def calculate_spread_columnar(merged_directory, spot_name, future_name, dumping_directory, storage_format='parquet'):
+    """
+    Calculate the spread from merged data kept in the columnar storage layer.
+
+    Only the timestamp and the two price columns of one monthly partition are loaded at a
+    time, and the spread dataset is written back to the storage layer under
+    'spreads_<spot>_<future>'.
+    """
+    columns = ['timestamp', 'weighted_avg_price_spot', 'weighted_avg_price_future']
+    spreads_name = f"spreads_{spot_name}_{future_name}"
+
+    # Replace any previous spread dataset, like the CSV output is overwritten
+    shutil.rmtree(os.path.join(dumping_directory, f"pair={spreads_name}"), ignore_errors=True)
+
+    # One monthly partition at a time, so memory stays flat as months are added
+    for year, month in storage.list_partitions(merged_directory, f"{spot_name}-{future_name}"):
+        df = storage.read_partition(merged_directory, f"{spot_name}-{future_name}", year, month, columns=columns, storage_format=storage_format)
+        print(f"Processing: Spot {spot_name}, Future {future_name}, {year}-{month:02d} ({len(df)} rows)")
+        instrumentation.add_rows(len(df))
+
+        # (future - spot) / spot
+        df_spreads = pd.DataFrame({
+            'timestamp': df['timestamp'].values,
+            'spread': (df['weighted_avg_price_future'].values - df['weighted_avg_price_spot'].values) / df['weighted_avg_price_spot'].values,
+        })
+        df_spreads.sort_values('timestamp', kind='stable', inplace=True)
+
+        written = storage.write_frame(df_spreads, dumping_directory, spreads_name, storage_format)
+        print(f"Saved: {written}")
+    return
@@ -1,7 +1,20 @@
 import pandas as pd
+import numpy as np
 import os
+import io
+import storage
+import parallel
+import instrumentation
+
+@instrumentation.instrumented('merge', 'merged_directory')
+def read_and_merge_csv_files(spot_directory, future_directory, spot_names, future_names, years, months, merged_directory, storage_format='csv',
+                             merge_mode='outer', tolerance=None, max_workers=None):
+    if merge_mode == 'asof':
+        return read_and_merge_asof(spot_directory, future_directory, spot_names, future_names, years, months, merged_directory,
+                                   storage_format, tolerance, max_workers)
+    if merge_mode != 'outer':
+        raise ValueError(f"Unknown merge mode '{merge_mode}', expected 'outer' or 'asof'")
 
-def read_and_merge_csv_files(spot_directory, future_directory, spot_names, future_names, years, months, merged_directory):
     for year in years:
         for month in months:
             for spot_name in spot_names:
@@ -37,20 +50,153 @@ def read_and_merge_csv_files(spot_directory, future_directory, spot_names, futur
                         # backward fill missing values
                         merged_df.bfill(inplace=True)
                         print(f"Merge files: {spot_filepath} and {future_filepath}")
+                        instrumentation.add_rows(len(merged_df))
                         # return merged_df
                     
                         # save the merged_df
-                        # Construct the filename using the provided format
-                        merged_filename = f"{spot_name}-{future_name}-{year}-{month:02d}.csv"
-                        # Full path for the CSV file
-                        merged_file_path = os.path.join(merged_directory, merged_filename)
-                        # Save the DataFrame as a CSV file
-                        merged_df.to_csv(merged_file_path)
-                        print(f"CSV file saved: {merged_file_path}")
+                        save_merged_data(merged_df, merged_directory, spot_name, future_name, year, month, storage_format)
                     else:
                         print(f"File does not exist: {spot_filepath} or {future_filepath}")
                         return None
 
+def save_merged_data(merged_df, merged_directory, spot_name, future_name, year, month, storage_format='csv'):
+    """
+    Save one month of merged data, indexed by timestamp, as CSV or into the columnar storage layer.
+    """
+    if storage_format == 'csv':
+        # Construct the filename using the provided format
+        merged_filename = f"{spot_name}-{future_name}-{year}-{month:02d}.csv"
+        # Full path for the CSV file
+        merged_file_path = os.path.join(merged_directory, merged_filename)
+        # Save the DataFrame as a CSV file
+        merged_df.to_csv(merged_file_path)
+        print(f"CSV file saved: {merged_file_path}")
+        return merged_file_path
+    else:
+        # Save into the columnar storage layer, partitioned by pair/year/month
+        merged_files = storage.write_frame(merged_df.reset_index(), merged_directory, f"{spot_name}-{future_name}", storage_format)
+        print(f"{storage_format} files saved: {merged_files}")
+        return merged_files
+
+def read_last_row(filepath):
+    """
+    Read the header and the last row of a CSV file without parsing the rest of it.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b''
+        # Read backwards in blocks until the tail holds a complete last line
+        while position > len(header) and tail.rstrip(b'\r\n').count(b'\n') < 1:
+            block = min(64 * 1024, position - len(header))
+            position -= block
+            f.seek(position)
+            tail = f.read(block) + tail
+    lines = tail.rstrip(b'\r\n').split(b'\n')
+    last_line = lines[-1] if lines and lines[-1].strip() else b''
+    return pd.read_csv(io.BytesIO(header + last_line + b'\n'))
+
+def _read_prices(filepath, price_column):
+    df = pd.read_csv(filepath)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.rename(columns={'weighted_avg_price': price_column})
+
+def _seed_with_previous_month(df, previous_filepath, price_column):
+    # Prepend the last price of the previous month so it can be carried into this month
+    if previous_filepath is None or not os.path.exists(previous_filepath):
+        return df
+    seed = read_last_row(previous_filepath)
+    seed['timestamp'] = pd.to_datetime(seed['timestamp'])
+    seed = seed.rename(columns={'weighted_avg_price': price_column})
+    return pd.concat([seed, df], ignore_index=True)
+
+def merge_month_asof(spot_filepath, future_filepath, previous_spot_filepath=None, previous_future_filepath=None, tolerance=None):
+    """
+    Merge one month of spot and future prices in a single sorted as-of pass.
+
+    Every timestamp of either series gets the last spot and future price at or before it,
+    so no price is ever taken from the future. The last prices of the previous month's
+    files are used as seeds, which carries prices across the month boundary.
+
+    Parameters:
+    - spot_filepath: Processed spot aggTrades file of the month.
+    - future_filepath: Processed future aggTrades file of the month.
+    - previous_spot_filepath: Optional spot file of the previous month.
+    - previous_future_filepath: Optional future file of the previous month.
+    - tolerance: Optional maximum age of a carried price (e.g. '5s' or pd.Timedelta).
+                 Timestamps without a fresh enough price on both legs are dropped.
+
+    Returns:
+    - The merged DataFrame indexed by timestamp.
+    """
+    spot_df = _read_prices(spot_filepath, 'weighted_avg_price_spot').sort_values('timestamp', kind='stable')
+    future_df = _read_prices(future_filepath, 'weighted_avg_price_future').sort_values('timestamp', kind='stable')
+    tolerance = None if tolerance is None else pd.Timedelta(tolerance)
+
+    # The output grid only holds this month's timestamps; the seeds only provide prices
+    merged_df = pd.DataFrame({'timestamp': np.union1d(spot_df['timestamp'].values, future_df['timestamp'].values)})
+    spot_df = _seed_with_previous_month(spot_df, previous_spot_filepath, 'weighted_avg_price_spot')
+    future_df = _seed_with_previous_month(future_df, previous_future_filepath, 'weighted_avg_price_future')
+
+    merged_df = pd.merge_asof(merged_df, spot_df, on='timestamp', direction='backward', tolerance=tolerance)
+    merged_df = pd.merge_asof(merged_df, future_df, on='timestamp', direction='backward', tolerance=tolerance)
+    merged_df = merged_df.dropna(subset=['weighted_avg_price_spot', 'weighted_avg_price_future'])
+    return merged_df.set_index('timestamp')
+
+def _merge_and_save_month_asof(spot_filepath, future_filepath, previous_spot_filepath, previous_future_filepath, tolerance,
+                               merged_directory, spot_name, future_name, year, month, storage_format):
+    merged_df = merge_month_asof(spot_filepath, future_filepath, previous_spot_filepath, previous_future_filepath, tolerance)
+    print(f"Merge files: {spot_filepath} and {future_filepath}")
+    return save_merged_data(merged_df, merged_directory, spot_name, future_name, year, month, storage_format), len(merged_df)
+
+def read_and_merge_asof(spot_directory, future_directory, spot_names, future_names, years, months, merged_directory, storage_format='csv',
+                        tolerance=None, max_workers=None):
+    """
+    Merge every spot x future x month combination with merge_month_asof, in parallel processes.
+
+    Each month only needs the last row of the previous month's files to carry prices across
+    the boundary, so all combinations are independent and run at the same time.
+
+    Parameters:
+    - tolerance: Optional maximum age of a carried price, see merge_month_asof.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 merges in the current process.
+    The other parameters are the same as read_and_merge_csv_files.
+    """
+    def processed_filepath(directory, name, year, month):
+        return os.path.join(directory, f"processed_{name}-aggTrades-{year}-{month:02d}.csv")
+
+    tasks = []
+    missing = False
+    for year in years:
+        for month in months:
+            previous_year, previous_month = (year, month - 1) if month > 1 else (year - 1, 12)
+            for spot_name in spot_names:
+                for future_name in future_names:
+                    spot_filepath = processed_filepath(spot_directory, spot_name, year, month)
+                    future_filepath = processed_filepath(future_directory, future_name, year, month)
+                    if not (os.path.exists(spot_filepath) and os.path.exists(future_filepath)):
+                        print(f"File does not exist: {spot_filepath} or {future_filepath}")
+                        missing = True
+                        break
+                    tasks.append((spot_filepath, future_filepath,
+                                  processed_filepath(spot_directory, spot_name, previous_year, previous_month),
+                                  processed_filepath(future_directory, future_name, previous_year, previous_month),
+                                  tolerance, merged_directory, spot_name, future_name, year, month, storage_format))
+                if missing:
+                    break
+            if missing:
+                break
+        if missing:
+            break
+
+    saved = parallel.run_tasks(_merge_and_save_month_asof, tasks, max_workers)
+    instrumentation.add_rows(sum(rows for _, rows in saved))
+    saved = [path for path, _ in saved]
+
+    return None if missing else saved
+
 def read_csv_files(merged_directory, spot_names, future_names, years, months):
     for year in years:
         for month in months:
@@ -1,14 +1,19 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
+import spread_store
+import reporting
 
-def calculate_spread_statistics(spreads_df):
+def calculate_spread_statistics(spreads_df, show_plot=True, plot_path=None):
     """
     Calculate and plot statistics for the 'spread' column in a DataFrame.
     
     Parameters:
     - spreads_df: DataFrame with a 'spread' column.
+    - show_plot: Display the histogram; set to False for batch and headless runs.
+    - plot_path: Optional file to save the histogram to.
     
     Returns:
     - A dictionary with mean, median, standard deviation, min, and max spread statistics.
@@ -24,24 +29,11 @@ def calculate_spread_statistics(spreads_df):
     max_spread = np.max(spread_values)
     two_sigma_range = (mean_spread - 2 * std_spread, mean_spread + 2 * std_spread)
 
-    # Plotting the histogram with count annotations
-    plt.figure(figsize=(10, 6))
-    n, bins, patches = plt.hist(spread_values, bins=30, color='skyblue', alpha=0.7)
-    plt.title('Histogram of Spread')
-    plt.xlabel('Spread')
-    plt.ylabel('Frequency')
-    plt.grid(True)
-
-    # Annotate each bar with the count
-    for rect in patches:
-        height = rect.get_height()
-        plt.annotate(f'{int(height)}',
-                     xy=(rect.get_x() + rect.get_width() / 2, height),
-                     xytext=(0, 3),  # 3 points vertical offset
-                     textcoords="offset points",
-                     ha='center', va='bottom')
-
-    plt.show()
+    # Histogram with count annotations, computed once and rendered only when asked for
+    if show_plot or plot_path:
+        hist = reporting.histogram(spread_values, bins=30)
+        reporting.render_histogram(hist, 'Histogram of Spread', 'Spread', 'Frequency', output_path=plot_path,
+                                   show=show_plot, color='skyblue', rwidth=1.0, grid=True)
 
     # Prepare and return the statistics
     stats = {
@@ -61,24 +53,62 @@ def calculate_spread_statistics(spreads_df):
 
     return stats
 
-def compare_signal_density_by_date(input_files, labels, time_frame=None, plot_type='density'):
-    plt.figure(figsize=(10, 6))  # Adjust figure size for better readability
-    
+def load_signals(input_file, time_frame=None, columns=None):
+    """
+    Load the signals of a signal durations file whose 'Start' falls within the time frame.
+
+    Parameters:
+    - input_file: A signal durations CSV file or a binary store written by spread_store.
+                  A store only reads the rows of the time frame.
+    - time_frame: An optional ('YYYY-MM-DD', 'YYYY-MM-DD') tuple; both ends are inclusive.
+    - columns: Optional list of columns to load.
+    """
+    start_date, end_date = (pd.to_datetime(time_frame[0]), pd.to_datetime(time_frame[1])) if time_frame else (None, None)
+
+    if spread_store.is_store(input_file):
+        return spread_store.SpreadStore(input_file).to_frame(start_date, end_date, columns=columns)
+
+    signals_df = pd.read_csv(input_file, usecols=columns)
+    signals_df['Start'] = pd.to_datetime(signals_df['Start'])
+    if time_frame:
+        signals_df = signals_df[(signals_df['Start'] >= start_date) & (signals_df['Start'] <= end_date)]
+    return signals_df
+
+def compare_signal_density_by_date(input_files, labels, time_frame=None, plot_type='density', show_plot=True, plot_path=None):
+    """
+    Plots the density or the count of trading signals over time for several signal files.
+
+    Parameters:
+    - input_files: Signal durations files, CSV files or binary stores written by spread_store.
+    - labels: Legend label of every file.
+    - time_frame: An optional ('YYYY-MM-DD', 'YYYY-MM-DD') tuple, see analyze_signal_density_by_date.
+    - plot_type: 'density' or 'count'.
+    - show_plot: Display the plot; set to False for batch and headless runs.
+    - plot_path: Optional file to save the plot to.
+
+    Returns:
+    - For 'density', the densities computed by reporting.binned_kde, one per file.
+    """
     # Define a set of colors and line styles for maximum separability
     colors = sns.color_palette('bright')[:len(input_files)]  # Use a bright color palette for better separation
-    
-    for i, (input_file, label) in enumerate(zip(input_files, labels)):
-        signals_df = pd.read_csv(input_file)
-        signals_df['Start'] = pd.to_datetime(signals_df['Start'])
 
-        if time_frame:
-            start_date, end_date = pd.to_datetime(time_frame[0]), pd.to_datetime(time_frame[1])
-            signals_df = signals_df[(signals_df['Start'] >= start_date) & (signals_df['Start'] <= end_date)]
+    if plot_type == 'density':
+        # Densities are computed on binned counts, so the cost does not grow with the number of signals
+        densities = [reporting.binned_kde(load_signals(input_file, time_frame, columns=['Start'])['Start'], bw_adjust=0.1)
+                     for input_file in input_files]
+        reporting.render_density(densities, labels, title='Comparative Density of Trading Signals Over Time', output_path=plot_path,
+                                 show=show_plot, colors=colors)
+        return densities
+
+    # pyplot is only needed to display the figure; a saved-only figure leaves its global state alone
+    fig = plt.figure(figsize=(10, 6)) if show_plot else Figure(figsize=(10, 6))  # Adjust figure size for better readability
+    ax = fig.add_subplot()
 
-        if plot_type == 'density':
-            sns.kdeplot(data=signals_df['Start'], shade=True, bw_adjust=0.1, label=label, color=colors[i])
-        elif plot_type == 'count':
-            sns.histplot(data=signals_df['Start'], kde=False, label=label, color=colors[i], element='step')
+    for i, (input_file, label) in enumerate(zip(input_files, labels)):
+        signals_df = load_signals(input_file, time_frame, columns=['Start'])
+
+        if plot_type == 'count':
+            sns.histplot(data=signals_df['Start'], kde=False, label=label, color=colors[i], element='step', ax=ax)
             ## Using plt.hist for better control over annotations
             # counts, bins, _ = plt.hist(signals_df['Start'], bins=30, label=label, color=colors[i], alpha=0.75)  # Adjust `bins` as needed
 
@@ -87,45 +117,71 @@ def compare_signal_density_by_date(input_files, labels, time_frame=None, plot_ty
             #     if count > 500:  # Only annotate bars with counts over 500
             #         plt.text(bin, count, f'{int(count)}', ha='center', va='bottom')
     
-    plt.title(f'Comparative {"Density" if plot_type == "density" else "Count"} of Trading Signals Over Time')
-    plt.xlabel('Date')
-    plt.xticks(rotation=45)  # Rotate x-axis labels for better visibility
-    plt.ylabel('Density' if plot_type == 'density' else 'Count')
-    plt.legend(loc='upper left')  # Move legend to the upper left or adjust as needed
-    plt.tight_layout()  # Adjust layout for better fit
-    plt.show()
-
-def analyze_signal_density_by_date(input_file, time_frame=None):
+    ax.set_title(f'Comparative {"Density" if plot_type == "density" else "Count"} of Trading Signals Over Time')
+    ax.set_xlabel('Date')
+    ax.tick_params(axis='x', labelrotation=45)  # Rotate x-axis labels for better visibility
+    ax.set_ylabel('Density' if plot_type == 'density' else 'Count')
+    ax.legend(loc='upper left')  # Move legend to the upper left or adjust as needed
+    fig.tight_layout()  # Adjust layout for better fit
+    if plot_path:
+        fig.savefig(plot_path)
+    if show_plot:
+        plt.show()
+
+def analyze_signal_density_by_date(input_file, time_frame=None, show_plot=True, plot_path=None):
     """
     Plots the density of trading signals over time.
     
     Parameters:
-    - input_file: The file path to read signal durations from.
+    - input_file: The file path to read signal durations from, either a CSV file or a
+                  binary store written by spread_store.
     - time_frame: An optional tuple specifying the start and end of the time frame to analyze. 
                   Format: ('YYYY-MM-DD', 'YYYY-MM-DD'). If not provided, analyzes the entire dataset.
+    - show_plot: Display the plot; set to False for batch and headless runs.
+    - plot_path: Optional file to save the plot to.
+
+    Returns:
+    - A dictionary with the bin 'centers' and the 'density' (per day) of the signal start times.
     """
-    # Read the data
-    signals_df = pd.read_csv(input_file)
-    
-    # Convert 'Start' to datetime if not already
-    signals_df['Start'] = pd.to_datetime(signals_df['Start'])
+    # Read the data, restricted to the time frame
+    signals_df = load_signals(input_file, time_frame, columns=['Start'])
 
-    if time_frame:
-        # Assuming time_frame is a date range
-        start_date, end_date = pd.to_datetime(time_frame[0]), pd.to_datetime(time_frame[1])
-        signals_df = signals_df[(signals_df['Start'] >= start_date) & (signals_df['Start'] <= end_date)]
-    
-    # Plot density
-    plt.figure(figsize=(10, 6))
-    sns.kdeplot(data=signals_df['Start'], shade=True, bw_adjust=0.1)
-    plt.title('Density of Trading Signals Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('Density')
-    plt.gcf().autofmt_xdate()  # Auto-format the x-axis labels for better readability
-    plt.show()
-
-def ms_data_future_spot_visualization():
+    # Plot density, computed on binned counts so the cost does not grow with the number of signals
+    density = reporting.binned_kde(signals_df['Start'], bw_adjust=0.1)
+    reporting.render_density([density], title='Density of Trading Signals Over Time', output_path=plot_path, show=show_plot)
+    return density
+
+def ms_data_future_spot_visualization(merged_file, time_frame=None):
     """
-    To be determined
+    Plots spot and future prices of a merged file (e.g. built from millisecond-level bars
+    by aggtrades_ingestion) together with their spread.
+
+    Parameters:
+    - merged_file: The merged CSV file with 'weighted_avg_price_spot' and 'weighted_avg_price_future' columns.
+    - time_frame: An optional tuple specifying the start and end of the time frame to plot.
+                  Format: ('YYYY-MM-DD HH:MM:SS', 'YYYY-MM-DD HH:MM:SS').
     """
-    return None
\ No newline at end of file
+    merged_df = pd.read_csv(merged_file)
+    merged_df['timestamp'] = pd.to_datetime(merged_df['timestamp'])
+
+    if time_frame:
+        start_date, end_date = pd.to_datetime(time_frame[0]), pd.to_datetime(time_frame[1])
+        merged_df = merged_df[(merged_df['timestamp'] >= start_date) & (merged_df['timestamp'] <= end_date)]
+
+    spot = merged_df['weighted_avg_price_spot'].values
+    future = merged_df['weighted_avg_price_future'].values
+
+    fig, (price_ax, spread_ax) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+    price_ax.step(merged_df['timestamp'], spot, where='post', label='Spot', linewidth=0.8)
+    price_ax.step(merged_df['timestamp'], future, where='post', label='Future', linewidth=0.8)
+    price_ax.set_ylabel('Price')
+    price_ax.set_title('Spot and Future Prices')
+    price_ax.legend(loc='upper left')
+
+    # (future - spot) / spot
+    spread_ax.step(merged_df['timestamp'], (future - spot) / spot, where='post', color='gray', linewidth=0.8)
+    spread_ax.set_ylabel('Spread')
+    spread_ax.set_xlabel('Time')
+    fig.autofmt_xdate()
+    plt.tight_layout()
+    plt.show()
\ No newline at end of file
@@ -1,69 +1,39 @@
 import pandas as pd
 import numpy as np
-from tqdm import tqdm  # Import tqdm for progress bar functionality
-import gc  # Garbage collection module
-import matplotlib.pyplot as plt
+import rolling_statistics
+import reporting
+import instrumentation
 
-def backtest_arbitrage_strategy_hedging_ratio_version_rolling(mean_n, merged_data, threshold, rolling_mean_window):
+# Positions are only taken after the first week of one-second data
+WARM_UP_ROWS = 1*60*60*24*7 + 1
+
+@instrumentation.instrumented('holding_backtest')
+def backtest_arbitrage_strategy_hedging_ratio_version_rolling(mean_n, merged_data, threshold, rolling_mean_window, show_plot=True, plot_path=None):
     # Ensure 'timestamp' is in datetime format
     merged_data['timestamp'] = pd.to_datetime(merged_data['timestamp'])
 
-    trade_entry_times = []  # Stores the entry time for each trade
-    trade_exit_times = []  # Stores the exit time for each trade
-    trade_count = 0
-    # spread_ratio_every = []
-    previous_position = None # Future
-    previous_entry_time = None  # Track the entry time for the current position
-    
-    for i, row in tqdm(merged_data.iterrows(), total=merged_data.shape[0]):
-        if i>1*60*60*24*7:
-            spread_ratio = row['spread']
-            mean_min=merged_data['spread'].iloc[i-mean_n:i].mean() #过去3min作为mean
-            current_time = row['timestamp']
-            if not previous_position:
-                if spread_ratio > threshold + mean_min:
-                    previous_position = 'short' # enter short in future & long in spot   merged_data['future_close'] - merged_data['spot_close']
-                    trade_count += 1
-
-                    previous_entry_time = current_time # record time
-                    # spread_ratio_every.append(spread_ratio)
-                    
-                elif spread_ratio < -threshold+mean_min:
-                    previous_position = 'long' # enter long in future & short in spot
-                    trade_count += 1
-
-                    previous_entry_time = current_time # record time
-                    # spread_ratio_every.append(spread_ratio)
-
-            else:
-                if previous_position == 'short' and spread_ratio < -threshold + mean_min:
-                    # exit short in future & long in spot
-                    trade_exit_times.append(current_time)
-                    trade_entry_times.append(previous_entry_time)
-                        
-                    # enter long in future & short in spot
-                    previous_position = 'long' # long future, short spot
-                    trade_count += 1
-                    
-                    previous_entry_time = current_time
-                    # spread_ratio_every.append(spread_ratio)
-                        
-                elif previous_position == 'long' and spread_ratio > threshold+mean_min:
-                    # exit long in future & short in spot
-                    trade_exit_times.append(current_time)
-                    trade_entry_times.append(previous_entry_time)
-                        
-                    # enter long in future & short in spot
-                    previous_position = 'short' # short future, long spot
-                    trade_count += 1
-                    
-                    previous_entry_time = current_time
-                    # spread_ratio_every.append(spread_ratio)
+    timestamps = merged_data['timestamp'].values
+    spreads = merged_data['spread'].values
+    instrumentation.add_rows(len(spreads))
+
+    # Mean of the previous mean_n spreads for every row, from running sums instead of re-slicing the series
+    if rolling_statistics.is_time_window(mean_n):
+        mean_min = rolling_statistics.time_trailing_mean(timestamps, spreads, mean_n)
+    else:
+        # All rows at once rather than through streaming_signals.StreamingSignal's TrailingMean;
+        # the two give identical means, as tests/test_streaming_signals.py checks
+        mean_min = rolling_statistics.trailing_mean(spreads, mean_n)
+
+    entry_indices, positions = detect_position_flips(spreads, mean_min, threshold, warm_up_index(timestamps, mean_n))
+
+    # Every flip exits the previous position and enters the opposite one
+    trade_entry_times = timestamps[entry_indices[:-1]]
+    trade_exit_times = timestamps[entry_indices[1:]]
 
     del merged_data  # merged_data is no longer needed
-    gc.collect()
+    instrumentation.collect_garbage('holding_backtest: merged data released')
 
-    trade_durations = [(exit_time - entry_time).total_seconds() for entry_time, exit_time in zip(trade_entry_times, trade_exit_times)]
+    trade_durations = ((trade_exit_times - trade_entry_times) / np.timedelta64(1, 's')).tolist()
     average_trade_duration = sum(trade_durations) / len(trade_durations) if trade_durations else 0
 
     metrics = {
@@ -74,15 +44,58 @@ def backtest_arbitrage_strategy_hedging_ratio_version_rolling(mean_n, merged_dat
     }
 
     # Analyze statistics
-    analyze_trade_durations(trade_durations)
+    if show_plot or plot_path:
+        analyze_trade_durations(trade_durations, output_path=plot_path, show=show_plot)
 
     del trade_durations, trade_entry_times, trade_exit_times
-    gc.collect()
+    instrumentation.collect_garbage('holding_backtest: trades released')
 
     return metrics#, trade_count, spread_ratio_every
 
 
-def analyze_trade_durations(trade_durations):
+def warm_up_index(timestamps, mean_n):
+    """
+    First row allowed to open a position: WARM_UP_ROWS for a row-count window, and the
+    first row a week after the start of the data for a time-based window.
+    """
+    if not rolling_statistics.is_time_window(mean_n) or len(timestamps) == 0:
+        return WARM_UP_ROWS
+    times = np.asarray(timestamps).astype('datetime64[ns]')
+    return int(np.searchsorted(times, times[0] + np.timedelta64(7, 'D'), side='left'))
+
+def detect_position_flips(spreads, mean_min, threshold, first_index):
+    """
+    Run the long/short flip state machine over the whole series with array operations.
+
+    A row above mean + threshold calls for a short position (short future, long spot) and
+    a row below mean - threshold calls for a long position (long future, short spot). The
+    first such row opens a position and every later row calling for the opposite side
+    flips it, so the entries are the rows where the called-for side changes.
+
+    Parameters:
+    - spreads: Array of spread values.
+    - mean_min: Array with the rolling mean compared against every row.
+    - threshold: Non-negative distance from the mean that triggers a position.
+    - first_index: First row allowed to open a position.
+
+    Returns:
+    - A tuple of (entry_indices, positions), where positions is 1 for long and -1 for short.
+    """
+    with np.errstate(invalid='ignore'):
+        above = spreads > threshold + mean_min
+        below = spreads < -threshold + mean_min
+    above[:first_index] = False
+    below[:first_index] = False
+
+    event_indices = np.flatnonzero(above | below)
+    event_positions = np.where(above[event_indices], -1, 1)
+
+    # Keep only the events that change the current position
+    changes = np.ones(len(event_indices), dtype=bool)
+    changes[1:] = event_positions[1:] != event_positions[:-1]
+    return event_indices[changes], event_positions[changes]
+
+def analyze_trade_durations(trade_durations, output_path=None, show=True):
     # Calculate statistics
     durations_array = np.array(trade_durations)
     mean_duration = np.mean(durations_array)
@@ -98,16 +111,8 @@ def analyze_trade_durations(trade_durations):
     print(f"Max Trade Duration: {max_duration} seconds")
     print(f"Min Trade Duration: {min_duration} seconds")
     
-    # Plot histogram
-    plt.figure(figsize=(10, 6))
-    counts, bins, patches = plt.hist(durations_array, bins='auto', color='blue', alpha=0.7, rwidth=0.85)
-    
-    # Annotate histogram bars
-    for count, bin, patch in zip(counts, bins, patches):
-        height = patch.get_height()
-        plt.annotate(f'{int(count)}', xy=(bin, height), xytext=(0, 5), textcoords='offset points', ha='center', va='bottom')
-    
-    plt.title('Histogram of Trade Durations')
-    plt.xlabel('Duration (seconds)')
-    plt.ylabel('Number of Trades')
-    plt.show()
\ No newline at end of file
+    # Histogram bins and counts are computed once; rendering is left to the reporting layer
+    hist = reporting.histogram(durations_array, bins='auto')
+    reporting.render_histogram(hist, 'Histogram of Trade Durations', 'Duration (seconds)', 'Number of Trades',
+                               output_path=output_path, show=show, color='blue')
+    return hist
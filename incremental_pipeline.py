@@ -0,0 +1,481 @@
+import os
+import io
+import re
+import glob
+import json
+import pandas as pd
+import numpy as np
+import data_merging
+import data_cleaning
+import rolling_statistics
+import trading_signal_analysis
+import holding_position_analysis
+
+def load_manifest(manifest_path):
+    """
+    Load the pipeline manifest, which records the months already merged and
+    spread-computed for every pair. A missing manifest is an empty one.
+    """
+    if not os.path.exists(manifest_path):
+        return {'merged': {}, 'merge_mode': {}, 'spread': {}}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest.setdefault('merge_mode', {})
+    return manifest
+
+def save_manifest(manifest, manifest_path):
+    _write_json(manifest, manifest_path)
+
+def _write_json(data, path):
+    # Write to a temporary file first so an interrupted run never leaves a truncated file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+def _write_npy(array, path):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporary_path, path)
+
+def available_months(directory, name):
+    """
+    List the (year, month) of every processed_<name>-aggTrades-YYYY-MM.csv file in a directory.
+    """
+    pattern = re.compile(rf"processed_{re.escape(name)}-aggTrades-(\d{{4}})-(\d{{2}})\.csv$")
+    months = []
+    for filename in os.listdir(directory):
+        match = pattern.match(filename)
+        if match:
+            months.append((int(match.group(1)), int(match.group(2))))
+    return sorted(months)
+
+def merge_new_months(spot_directory, future_directory, spot_name, future_name, merged_directory, manifest_path, merge_mode='outer', tolerance=None):
+    """
+    Merge only the months whose spot and future files exist but are not in the manifest yet.
+
+    The merge mode defaults to the one of data_merging.read_and_merge_csv_files, so the
+    merged files match a full rerun. It is recorded in the manifest, and merging new months
+    of a pair in another mode than its earlier months is refused.
+
+    Returns:
+    - The list of 'YYYY-MM' months merged by this call.
+    """
+    manifest = load_manifest(manifest_path)
+    pair = f"{spot_name}-{future_name}"
+    merged_months = set(manifest['merged'].get(pair, []))
+
+    recorded_mode = manifest['merge_mode'].get(pair)
+    if merged_months and recorded_mode is not None and recorded_mode != merge_mode:
+        raise ValueError(f"{pair} was merged with merge_mode='{recorded_mode}', not '{merge_mode}'; "
+                         f"pass merge_mode='{recorded_mode}' or delete its merged months from {manifest_path} to remerge")
+    manifest['merge_mode'][pair] = merge_mode
+    os.makedirs(merged_directory, exist_ok=True)
+
+    new_months = sorted(set(available_months(spot_directory, spot_name)) & set(available_months(future_directory, future_name)))
+    new_months = [(year, month) for year, month in new_months if f"{year}-{month:02d}" not in merged_months]
+
+    for year, month in new_months:
+        data_merging.read_and_merge_csv_files(spot_directory, future_directory, [spot_name], [future_name], [year], [month], merged_directory,
+                                              merge_mode=merge_mode, tolerance=tolerance, max_workers=1)
+        # Record every month as soon as it is saved, so an interrupted run resumes where it stopped
+        merged_months.add(f"{year}-{month:02d}")
+        manifest['merged'][pair] = sorted(merged_months)
+        save_manifest(manifest, manifest_path)
+
+    return [f"{year}-{month:02d}" for year, month in new_months]
+
+def append_new_spreads(merged_directory, spot_name, future_name, dumping_directory, manifest_path, chunksize=1_000_000):
+    """
+    Append the spread of newly merged months to spreads_<spot>_<future>.csv instead of
+    recomputing the whole history.
+
+    New months have to come after the last spread-computed month; a month landing in the
+    middle of the history needs a full data_cleaning.calculate_spread run. The timestamp
+    format of the file is recorded in the manifest; a new month needing a finer one (e.g.
+    the first sub-second month) rewrites the file, so it always matches a full run.
+
+    Returns:
+    - The list of 'YYYY-MM' months appended by this call.
+    """
+    manifest = load_manifest(manifest_path)
+    pair = f"{spot_name}-{future_name}"
+    spread_months = manifest['spread'].get(pair, [])
+    filename = os.path.join(dumping_directory, f"spreads_{spot_name}_{future_name}.csv")
+
+    csv_files = {os.path.basename(csv_file)[-11:-4]: csv_file for csv_file in data_cleaning.merged_files_in_order(merged_directory, spot_name, future_name)}
+    new_months = sorted(month for month in csv_files if month not in spread_months)
+    if spread_months and new_months and new_months[0] < spread_months[-1]:
+        raise ValueError(f"Month {new_months[0]} is older than the last spread month {spread_months[-1]}; rerun calculate_spread for {pair}")
+
+    last_timestamp = manifest.get('spread_last_timestamp', {}).get(pair)
+    last_timestamp = None if last_timestamp is None else pd.Timestamp(last_timestamp)
+    unit = manifest.setdefault('spread_timestamp_unit', {}).get(pair)
+
+    rebuild = not spread_months or not os.path.exists(filename) or unit is None
+    if not rebuild:
+        # The rows already written keep their format only if the new months fit in it
+        rebuild = data_cleaning.merged_timestamp_unit([csv_files[month] for month in new_months], chunksize, unit) != unit
+    if rebuild:
+        # Start the file from scratch, in the format of the whole history
+        spread_months = []
+        new_months = sorted(csv_files)
+        last_timestamp = None
+        unit = data_cleaning.merged_timestamp_unit([csv_files[month] for month in new_months], chunksize)
+        with open(filename, 'w', newline='') as output:
+            pd.DataFrame(columns=['timestamp', 'spread']).to_csv(output, index=False)
+    for month in new_months:
+        with open(filename, 'a', newline='') as output:
+            last_timestamp = data_cleaning.append_spreads([csv_files[month]], output, chunksize, last_timestamp, unit)
+        spread_months.append(month)
+        manifest['spread'][pair] = spread_months
+        manifest['spread_timestamp_unit'][pair] = unit
+        manifest.setdefault('spread_last_timestamp', {})[pair] = None if last_timestamp is None else str(last_timestamp)
+        save_manifest(manifest, manifest_path)
+
+    print(f"Saved: {filename}")
+    return new_months
+
+SIGNAL_TIME_COLUMNS = ['Start', 'End']
+
+def _signal_rows(signal_start_times, signal_end_times, signal_durations):
+    return pd.DataFrame({'Start': signal_start_times, 'End': signal_end_times, 'Duration': signal_durations})
+
+def _signal_units(signals_df, units=None):
+    # Timestamp unit of every time column, at least as fine as `units` (see data_cleaning.timestamp_unit)
+    units = units or {column: 'D' for column in SIGNAL_TIME_COLUMNS}
+    return {column: data_cleaning.timestamp_unit(signals_df[column].values, units[column]) for column in SIGNAL_TIME_COLUMNS}
+
+def _write_signal_rows(signals_df, output, units):
+    # Preformatted, so rows appended by different runs share the format of a single to_csv call
+    signals_df = signals_df.assign(**{column: data_cleaning.format_timestamps(signals_df[column].values, units[column])
+                                      for column in SIGNAL_TIME_COLUMNS})
+    signals_df.to_csv(output, header=False, index=False)
+
+def _ends_with(path, offset, data):
+    # Whether the bytes of a file just before offset are `data`
+    if offset < len(data) or os.path.getsize(path) < offset:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(offset - len(data))
+        return f.read(len(data)) == data
+
+def _row_offset(path, rows, block_size=2**24):
+    # Byte offset just after the header and `rows` rows of a CSV file
+    with open(path, 'rb') as f:
+        offset = len(f.readline())
+        while rows:
+            block = f.read(block_size)
+            if not block:
+                raise ValueError(f"{path} has fewer than {rows} rows")
+            newlines = block.count(b'\n')
+            if newlines >= rows:
+                position = -1
+                for _ in range(rows):
+                    position = block.index(b'\n', position + 1)
+                return offset + position + 1
+            offset += len(block)
+            rows -= newlines
+    return offset
+
+def _find_spread_offset(spread_file, state):
+    last_line = state.get('last_line', '').encode()
+    if state['rows'] and not _ends_with(spread_file, state['spread_offset'], last_line):
+        # The spread file was rewritten in a finer timestamp format: find the same row again
+        state['spread_offset'] = _row_offset(spread_file, state['rows'])
+
+def _read_spread_rows(spread_file, offset, size):
+    # The raw bytes and the parsed rows of the spread file between two offsets
+    with open(spread_file, 'rb') as f:
+        f.seek(offset)
+        new_rows = f.read(size - offset)
+    if new_rows:
+        new_data = pd.read_csv(io.BytesIO(new_rows), names=['timestamp', 'spread'], header=None)
+        new_data['timestamp'] = pd.to_datetime(new_data['timestamp'])
+    else:
+        new_data = pd.DataFrame({'timestamp': pd.to_datetime([]), 'spread': np.empty(0)})
+    return new_rows, new_data
+
+def _last_line(new_rows):
+    return new_rows[new_rows.rstrip(b'\n').rfind(b'\n') + 1:].decode()
+
+def _finish_pending_output(state, output_file_path):
+    # A rewrite of the signal file interrupted after its state was saved is completed here
+    pending = state.pop('pending_output', None)
+    if pending is not None and os.path.exists(pending):
+        os.replace(pending, output_file_path)
+
+def run_signal_backtest_incremental(spread_file, mean_n, threshold, rolling_mean_window, dump_file_directory, checkpoint_directory):
+    """
+    Run the trading signal backtest on the rows of spread_file that were not processed yet,
+    continuing from the checkpoint of the previous run.
+
+    The checkpoint holds the state of the rolling mean (rolling_statistics.RollingMean, which
+    follows pandas' rolling mean bit for bit), the start of a signal still open at the end of
+    the last run, the byte offsets reached in the spread file and in
+    signal_durations_<window>.csv, and the timestamp format of that file. New rows are read
+    from the recorded offset, the provisional row of an open signal is replaced, and the new
+    signals are appended, which gives the same file as
+    modified_optimized_backtest_arbitrage_strategy on the full history.
+
+    The window values are saved to a new file named after the spread offset and the JSON
+    state, which points to it, is replaced last, so an interrupted run resumes from the
+    previous checkpoint.
+
+    Parameters:
+    - spread_file: spreads_<spot>_<future>.csv, grown by append_new_spreads.
+    - mean_n: Number of rows in the rolling mean window; durations such as '15min' are not supported.
+    - threshold: Spread threshold around the rolling mean.
+    - rolling_mean_window: Label used in the output file name.
+    - dump_file_directory: Directory of signal_durations_<window>.csv.
+    - checkpoint_directory: Directory holding the checkpoints.
+
+    Returns:
+    - The metrics of calculate_trade_durations_statistics over all signals so far.
+    """
+    if rolling_statistics.is_time_window(mean_n):
+        # The checkpoint keeps a window of mean_n rows, which a duration does not bound
+        raise ValueError(f"run_signal_backtest_incremental needs mean_n as a number of rows, not the duration {mean_n!r}; "
+                         "use trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy for time windows")
+
+    trading_signal_analysis.check_create_directory(dump_file_directory)
+    os.makedirs(checkpoint_directory, exist_ok=True)
+    output_file_path = os.path.join(dump_file_directory, f"signal_durations_{rolling_mean_window}.csv")
+    stem = os.path.join(checkpoint_directory, f"signal_durations_{rolling_mean_window}")
+    state_path = f"{stem}.json"
+
+    parameters = {'spread_file': os.path.abspath(spread_file), 'mean_n': mean_n, 'threshold': threshold}
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state['parameters'] != parameters:
+            raise ValueError(f"Checkpoint {state_path} was made with {state['parameters']}, not {parameters}")
+        _finish_pending_output(state, output_file_path)
+    if state is not None and 'window_file' in state and os.path.exists(output_file_path):
+        rolling_mean = rolling_statistics.RollingMean.from_state(state['rolling_mean'], np.load(state['window_file']))
+    else:
+        with open(spread_file, 'rb') as f:
+            header_size = len(f.readline())
+        state = {'parameters': parameters, 'spread_offset': header_size, 'rows': 0, 'open_signal_start': None,
+                 'output_offset': None, 'closed_signal_count': 0, 'closed_units': None, 'written_units': None}
+        rolling_mean = rolling_statistics.RollingMean(mean_n)
+        with open(output_file_path, 'w', newline='') as output:
+            _signal_rows([], [], []).to_csv(output, index=False)
+        state['output_offset'] = os.path.getsize(output_file_path)
+
+    _find_spread_offset(spread_file, state)
+
+    # Read only the rows appended since the last run
+    spread_size = os.path.getsize(spread_file)
+    new_rows, new_data = _read_spread_rows(spread_file, state['spread_offset'], spread_size)
+
+    if len(new_data):
+        # The rolling mean continues from the saved window with the arithmetic of the full run
+        spreads = new_data['spread'].values.astype(float)
+        means = np.array([rolling_mean.push(value) for value in spreads.tolist()])
+        upper_bound = means + threshold
+        lower_bound = means - threshold
+        timestamps = new_data['timestamp'].values.astype('datetime64[ns]')
+        first_index = max(mean_n - 1 - state['rows'], 0)
+
+        closed_rows = []
+        open_signal_start = state['open_signal_start']
+        if open_signal_start is not None:
+            # The signal open at the end of the last run closes on the first decided new row
+            open_signal_start = np.datetime64(open_signal_start, 'ns')
+            new_spreads, new_upper, new_lower = spreads[first_index:], upper_bound[first_index:], lower_bound[first_index:]
+            decided = np.flatnonzero((new_spreads > new_upper) | (new_spreads < new_lower) | ((new_spreads <= new_upper) & (new_spreads >= new_lower)))
+            if len(decided):
+                end_time = timestamps[first_index + decided[0]]
+                duration = (end_time - open_signal_start).astype('timedelta64[s]').astype(float)
+                closed_rows.append(_signal_rows([open_signal_start], [end_time], [0.5 if duration < 1 else duration]))
+                open_signal_start = None
+
+        signal_start_times, signal_end_times, signal_durations, signal_open = trading_signal_analysis.detect_signals(
+            timestamps, spreads, upper_bound, lower_bound, first_index, return_open=True)
+        signals_df = _signal_rows(signal_start_times, signal_end_times, signal_durations)
+
+        # A signal still open at the end is written last and replaced by the next run
+        still_open = None
+        if open_signal_start is not None:
+            duration = np.maximum((timestamps[-1] - open_signal_start).astype('timedelta64[s]').astype(int), 1)
+            still_open = _signal_rows([open_signal_start], [timestamps[-1]], np.array([duration]))
+        elif signal_open:
+            still_open = signals_df.iloc[-1:]
+            signals_df = signals_df.iloc[:-1]
+        closed_df = pd.concat(closed_rows + [signals_df], ignore_index=True) if closed_rows else signals_df
+
+        # Durations are written as floats as soon as one signal has closed, like a full run does
+        closed_signal_count = state['closed_signal_count'] + len(closed_df)
+        if closed_signal_count and still_open is not None:
+            still_open = still_open.astype({'Duration': float})
+        if len(closed_df):
+            closed_df = closed_df.astype({'Duration': float})
+
+        # A full run formats every time column for all its rows, so the units cover the closed and the open signals
+        closed_units = _signal_units(closed_df, state['closed_units'])
+        units = _signal_units(still_open, closed_units) if still_open is not None else closed_units
+
+        if state['closed_signal_count'] and units != state['written_units']:
+            # The signals already written need the finer format: rewrite the file beside it
+            previous_df = pd.read_csv(output_file_path, nrows=state['closed_signal_count'])
+            for column in SIGNAL_TIME_COLUMNS:
+                previous_df[column] = pd.to_datetime(previous_df[column])
+            pending = f"{output_file_path}.tmp"
+            with open(pending, 'w', newline='') as output:
+                _signal_rows([], [], []).to_csv(output, index=False)
+                _write_signal_rows(previous_df, output, units)
+                _write_signal_rows(closed_df, output, units)
+                output_offset = output.tell()
+                if still_open is not None:
+                    _write_signal_rows(still_open, output, units)
+        else:
+            pending = None
+            with open(output_file_path, 'r+', newline='') as output:
+                output.truncate(state['output_offset'])
+                output.seek(state['output_offset'])
+                _write_signal_rows(closed_df, output, units)
+                output_offset = output.tell()
+                if still_open is not None:
+                    _write_signal_rows(still_open, output, units)
+
+        window_file = f"{stem}_window-{spread_size}.npy"
+        rolling_mean_state, window_values = rolling_mean.state()
+        _write_npy(window_values, window_file)
+        state.update({'open_signal_start': None if still_open is None else str(pd.Timestamp(still_open['Start'].iloc[0])),
+                      'closed_signal_count': closed_signal_count, 'closed_units': closed_units, 'written_units': units,
+                      'output_offset': output_offset, 'spread_offset': spread_size, 'rows': state['rows'] + len(new_data),
+                      'last_line': _last_line(new_rows),
+                      'rolling_mean': rolling_mean_state, 'window_file': window_file, 'pending_output': pending})
+        # The state is written last: until it is replaced, the previous checkpoint stays valid
+        _write_json(state, state_path)
+        if pending is not None:
+            _finish_pending_output(state, output_file_path)
+            _write_json(state, state_path)
+        for stale in glob.glob(f"{glob.escape(stem)}_window-*.npy"):
+            if stale != window_file:
+                os.remove(stale)
+    elif 'window_file' not in state:
+        # Nothing to read yet: the checkpoint of an empty history
+        window_file = f"{stem}_window-{spread_size}.npy"
+        rolling_mean_state, window_values = rolling_mean.state()
+        _write_npy(window_values, window_file)
+        state.update({'rolling_mean': rolling_mean_state, 'window_file': window_file})
+        _write_json(state, state_path)
+
+    signal_durations = pd.read_csv(output_file_path, usecols=['Duration'])['Duration'].values
+    return trading_signal_analysis.calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+
+def run_holding_backtest_incremental(spread_file, mean_n, threshold, rolling_mean_window, checkpoint_directory, show_plot=False, plot_path=None):
+    """
+    Run the holding position backtest on the rows of spread_file that were not processed
+    yet, continuing from the checkpoint of the previous run.
+
+    The trailing mean of a row only depends on the mean_n rows before it once the series
+    holds mean_n rows; before that, trailing_mean wraps the first rows around to the end of
+    the series, so until then every run starts over from the first row. Positions never
+    open before holding_position_analysis.WARM_UP_ROWS, and the flips only depend on the
+    position held, so the checkpoint holds the state of the trailing mean
+    (rolling_statistics.TrailingMean, which follows trailing_mean bit for bit), the position
+    and the time it was entered, the trade durations so far and the offset reached in the
+    spread file. The metrics are those of
+    backtest_arbitrage_strategy_hedging_ratio_version_rolling on the full history.
+
+    The arrays are saved to new files named after the spread offset and the JSON state,
+    which points to them, is replaced last, so an interrupted run resumes from the previous
+    checkpoint.
+
+    Parameters:
+    - spread_file: spreads_<spot>_<future>.csv, grown by append_new_spreads.
+    - mean_n: Number of previous rows in the trailing mean; durations such as '15min' are not supported.
+    - threshold: Spread threshold around the trailing mean.
+    - rolling_mean_window: Label used in the checkpoint file names.
+    - checkpoint_directory: Directory holding the checkpoints.
+    - show_plot: Whether to show the histogram of trade durations.
+    - plot_path: Optional file to save the histogram to.
+
+    Returns:
+    - The metrics of backtest_arbitrage_strategy_hedging_ratio_version_rolling over all trades so far.
+    """
+    if rolling_statistics.is_time_window(mean_n):
+        # The checkpoint keeps a window of mean_n rows, and the warm-up of a duration depends on the first timestamp
+        raise ValueError(f"run_holding_backtest_incremental needs mean_n as a number of rows, not the duration {mean_n!r}; "
+                         "use holding_position_analysis.backtest_arbitrage_strategy_hedging_ratio_version_rolling for time windows")
+
+    os.makedirs(checkpoint_directory, exist_ok=True)
+    stem = os.path.join(checkpoint_directory, f"holding_{rolling_mean_window}")
+    state_path = f"{stem}.json"
+
+    parameters = {'spread_file': os.path.abspath(spread_file), 'mean_n': mean_n, 'threshold': threshold,
+                  'warm_up_rows': holding_position_analysis.WARM_UP_ROWS}
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state['parameters'] != parameters:
+            raise ValueError(f"Checkpoint {state_path} was made with {state['parameters']}, not {parameters}")
+    if state is not None and state['rows'] >= mean_n:
+        trailing_mean = rolling_statistics.TrailingMean.from_state(state['trailing_mean'], np.load(state['window_file']))
+        durations = np.load(state['durations_file'])
+        _find_spread_offset(spread_file, state)
+    else:
+        # Until mean_n rows are seen, the means of the first rows change with every new row
+        with open(spread_file, 'rb') as f:
+            header_size = len(f.readline())
+        state = {'parameters': parameters, 'spread_offset': header_size, 'rows': 0, 'position': 0, 'entry_time': None}
+        trailing_mean = rolling_statistics.TrailingMean(mean_n)
+        durations = np.empty(0)
+
+    spread_size = os.path.getsize(spread_file)
+    new_rows, new_data = _read_spread_rows(spread_file, state['spread_offset'], spread_size)
+
+    if len(new_data):
+        spreads = new_data['spread'].values.astype(float)
+        timestamps = new_data['timestamp'].values.astype('datetime64[ns]')
+        rows = state['rows'] + len(new_data)
+        if rows < mean_n:
+            # Started over above, so these are all the rows, with the wrapped means of a full run
+            means = rolling_statistics.trailing_mean(spreads, mean_n)
+        else:
+            means = np.array([trailing_mean.push(value) for value in spreads.tolist()])
+
+        first_index = max(holding_position_analysis.WARM_UP_ROWS - state['rows'], 0)
+        entry_indices, positions = holding_position_analysis.detect_position_flips(spreads, means, threshold, first_index)
+        if len(positions) and positions[0] == state['position']:
+            # The first event only confirms the position held at the end of the last run
+            entry_indices, positions = entry_indices[1:], positions[1:]
+
+        # Every flip exits the previous position, including the one entered in an earlier run
+        entry_times = timestamps[entry_indices]
+        if state['entry_time'] is not None:
+            entry_times = np.concatenate(([np.datetime64(state['entry_time'], 'ns')], entry_times))
+        durations = np.concatenate((durations, (entry_times[1:] - entry_times[:-1]) / np.timedelta64(1, 's')))
+        if len(positions):
+            state.update({'position': int(positions[-1]), 'entry_time': str(pd.Timestamp(entry_times[-1]))})
+
+        checkpoint_files = [f"{stem}_durations-{spread_size}.npy"]
+        _write_npy(durations, checkpoint_files[0])
+        state.update({'durations_file': checkpoint_files[0], 'spread_offset': spread_size, 'rows': rows,
+                      'last_line': _last_line(new_rows)})
+        if rows >= mean_n:
+            checkpoint_files.append(f"{stem}_window-{spread_size}.npy")
+            trailing_mean_state, window_values = trailing_mean.state()
+            _write_npy(window_values, checkpoint_files[1])
+            state.update({'trailing_mean': trailing_mean_state, 'window_file': checkpoint_files[1]})
+        # The state is written last: until it is replaced, the previous checkpoint stays valid
+        _write_json(state, state_path)
+        for stale in glob.glob(f"{glob.escape(stem)}_window-*.npy") + glob.glob(f"{glob.escape(stem)}_durations-*.npy"):
+            if stale not in checkpoint_files:
+                os.remove(stale)
+
+    trade_durations = durations.tolist()
+    if trade_durations and (show_plot or plot_path):
+        holding_position_analysis.analyze_trade_durations(trade_durations, output_path=plot_path, show=show_plot)
+    return {
+        'Rolling Mean Window': rolling_mean_window,
+        'Spread Threshold': threshold,
+        'Trade Count': len(trade_durations),
+        'Average Trade Duration (seconds)': sum(trade_durations) / len(trade_durations) if trade_durations else 0,
+    }
@@ -0,0 +1,288 @@
+import os
+import gc
+import sys
+import json
+import time
+import inspect
+import platform
+import functools
+import threading
+import contextlib
+import collections
+
+# Comma-separated profilers run around every stage: 'cprofile', 'tracemalloc' or both
+PROFILE_ENV = 'PIPELINE_PROFILE'
+# Set to write the run report next to the outputs of every top-level stage
+REPORT_ENV = 'PIPELINE_REPORT'
+# Garbage collection policy of collect_garbage: 'auto' (default), 'always' or 'never'
+GC_ENV = 'PIPELINE_GC'
+
+# collect_garbage only collects in 'auto' mode once the RSS grew this much since the last collection
+GC_RSS_GROWTH_MB = 256
+# Interval of the background thread sampling the RSS of running stages
+RSS_SAMPLE_INTERVAL = 0.05
+# Stage records and garbage collection decisions kept in the run report; older ones are dropped
+RUN_RECORD_LIMIT = 10_000
+
+REPORT_FILENAME = 'run_report.json'
+
+_run = {}  # filled by reset()
+_open_stages = []
+_lock = threading.Lock()
+_sampler = None  # (thread, stop event) of the RSS sampler while a stage is open
+_last_collection_rss_mb = None
+
+def rss_mb():
+    """
+    Current resident set size of the process in MB, or the peak RSS where the current one
+    cannot be read (outside Linux).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the process so far in MB.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _sample_rss(stop):
+    while not stop.wait(RSS_SAMPLE_INTERVAL):
+        with _lock:
+            current = rss_mb()
+            for record in _open_stages:
+                record['peak_rss_mb'] = max(record['peak_rss_mb'], current)
+
+def _start_sampler():
+    # Called with _lock held when the first stage opens
+    global _sampler
+    stop = threading.Event()
+    thread = threading.Thread(target=_sample_rss, args=(stop,), name='rss-sampler', daemon=True)
+    thread.start()
+    _sampler = (thread, stop)
+
+def _stop_sampler():
+    # Called with _lock held when the last stage closes; the thread is joined once the lock is released
+    global _sampler
+    thread, stop = _sampler
+    _sampler = None
+    stop.set()
+    return thread
+
+def _profilers():
+    return {name.strip().lower() for name in os.environ.get(PROFILE_ENV, '').split(',') if name.strip()}
+
+class Stage:
+    """
+    Handle of a running stage, used to count the rows it processes.
+    """
+    def __init__(self, record):
+        self.record = record
+
+    def add_rows(self, rows):
+        self.record['rows'] = (self.record['rows'] or 0) + int(rows)
+
+@contextlib.contextmanager
+def stage(name, rows=None, output_directory=None, **details):
+    """
+    Time a pipeline stage and record its rows and peak RSS in the run report.
+
+    Stages can be nested; the RSS of every open stage is sampled by a background thread,
+    which runs from the moment the first stage opens until the last one closes.
+    With PIPELINE_PROFILE=cprofile the stage also runs under cProfile and its statistics
+    are written to <name>.prof; with PIPELINE_PROFILE=tracemalloc its peak traced Python
+    allocation is recorded. With PIPELINE_REPORT set, the report is written to
+    output_directory when a top-level stage ends.
+
+    Parameters:
+    - name: Stage name, e.g. 'merge' or 'signal_backtest'.
+    - rows: Rows processed, if known up front; otherwise count them with add_rows.
+    - output_directory: Directory of the stage outputs, where reports and profiles go.
+    - details: Other JSON-serializable values to record, e.g. the pair or the window.
+
+    Usage:
+        with instrumentation.stage('spread', pair='SOLUSDT-SOLUSDT') as current:
+            ...
+            current.add_rows(len(chunk))
+    """
+    profilers = _profilers()
+    current_rss = rss_mb()
+    record = {'name': name, 'rows': rows, 'details': details, 'parent': _open_stages[-1]['name'] if _open_stages else None,
+              'start_rss_mb': current_rss, 'peak_rss_mb': current_rss}
+
+    profiler = None
+    if 'cprofile' in profilers:
+        import cProfile
+        profiler = cProfile.Profile()
+    tracing = 'tracemalloc' in profilers
+    if tracing:
+        import tracemalloc
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    with _lock:
+        _open_stages.append(record)
+        if _sampler is None:
+            _start_sampler()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield Stage(record)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['seconds'] = time.perf_counter() - start
+        record['cpu_seconds'] = time.process_time() - cpu_start
+        current_rss = rss_mb()
+        sampler = None
+        with _lock:
+            _open_stages.remove(record)
+            record['end_rss_mb'] = current_rss
+            record['peak_rss_mb'] = max(record['peak_rss_mb'], current_rss)
+            if not _open_stages:
+                sampler = _stop_sampler()
+        if sampler is not None:
+            sampler.join()
+        record['rows_per_second'] = record['rows'] / record['seconds'] if record['rows'] and record['seconds'] > 0 else None
+
+        if tracing:
+            record['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            if started_tracing:
+                tracemalloc.stop()
+        if profiler is not None:
+            profile_directory = output_directory or '.'
+            os.makedirs(profile_directory, exist_ok=True)
+            record['profile'] = os.path.join(profile_directory, f"{name}.prof")
+            profiler.dump_stats(record['profile'])
+
+        _run['stages'].append(record)
+        if record['parent'] is None and os.environ.get(REPORT_ENV):
+            write_report(output_directory or '.')
+            # Every report covers the top-level stages run since the previous one
+            reset()
+
+def add_rows(rows):
+    """
+    Count rows processed by the innermost running stage, if any.
+    """
+    with _lock:
+        if _open_stages:
+            Stage(_open_stages[-1]).add_rows(rows)
+
+def instrumented(name, output_directory_argument=None):
+    """
+    Decorator running every call of a function as a stage.
+
+    Parameters:
+    - name: Stage name.
+    - output_directory_argument: Name of the function argument holding its output directory,
+                                 where the run report and profiles are written.
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            output_directory = None
+            if output_directory_argument is not None:
+                output_directory = signature.bind_partial(*args, **kwargs).arguments.get(output_directory_argument)
+            with stage(name, output_directory=output_directory):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def collect_garbage(reason=None):
+    """
+    Replacement for the ad hoc gc.collect() calls: collect only when it is worth it and
+    record every decision in the run report.
+
+    With PIPELINE_GC=auto (the default) a collection runs only once the RSS grew by
+    GC_RSS_GROWTH_MB since the last one; 'always' collects every time and 'never' only
+    records the RSS. Large arrays are freed as soon as they are deleted either way; a
+    collection only reclaims reference cycles.
+
+    Returns:
+    - The number of unreachable objects found, or None if no collection ran.
+    """
+    global _last_collection_rss_mb
+    policy = os.environ.get(GC_ENV, 'auto').lower()
+    before = rss_mb()
+    if _last_collection_rss_mb is None:
+        _last_collection_rss_mb = _run['start_rss_mb']
+
+    collect = policy == 'always' or (policy == 'auto' and before - _last_collection_rss_mb >= GC_RSS_GROWTH_MB)
+    decision = {'reason': reason, 'stage': _open_stages[-1]['name'] if _open_stages else None, 'policy': policy,
+                'collected': collect, 'rss_before_mb': before}
+    found = None
+    if collect:
+        start = time.perf_counter()
+        found = gc.collect()
+        decision['seconds'] = time.perf_counter() - start
+        decision['unreachable_objects'] = found
+        decision['rss_after_mb'] = rss_mb()
+        _last_collection_rss_mb = decision['rss_after_mb']
+    _run['garbage_collections'].append(decision)
+    return found
+
+def report():
+    """
+    The run report so far: environment, stages in completion order and garbage collection
+    decisions, the last RUN_RECORD_LIMIT of each.
+    """
+    return {
+        'started': _run['started'],
+        'elapsed_seconds': time.time() - _run['started'],
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'pid': os.getpid(),
+                        'profile': sorted(_profilers()), 'gc_policy': os.environ.get(GC_ENV, 'auto')},
+        'start_rss_mb': _run['start_rss_mb'],
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': list(_run['stages']),
+        'garbage_collections': list(_run['garbage_collections']),
+    }
+
+def write_report(directory, filename=REPORT_FILENAME):
+    """
+    Write the run report as JSON into a directory and return its path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(report(), f, indent=2, default=str)
+    os.replace(temporary_path, path)
+    return path
+
+def reset():
+    """
+    Start a new run report, e.g. between notebook runs.
+    """
+    global _last_collection_rss_mb
+    with _lock:
+        _run.update({'started': time.time(), 'start_rss_mb': rss_mb(), 'stages': collections.deque(maxlen=RUN_RECORD_LIMIT),
+                     'garbage_collections': collections.deque(maxlen=RUN_RECORD_LIMIT)})
+    _last_collection_rss_mb = None
+
+def _after_fork_in_child():
+    # A worker forked inside a stage has no sampler thread and reports nothing of its parent's run
+    global _lock, _sampler
+    _lock = threading.Lock()
+    _sampler = None
+    _open_stages.clear()
+    reset()
+
+reset()
+if hasattr(os, 'register_at_fork'):
+    # Holding the lock across fork keeps a child from inheriting it locked by the sampler
+    os.register_at_fork(before=_lock.acquire, after_in_parent=_lock.release, after_in_child=_after_fork_in_child)
@@ -0,0 +1,208 @@
+import os
+import json
+import tempfile
+import pandas as pd
+import numpy as np
+import rolling_statistics
+import trading_signal_analysis
+import parallel
+
+def read_symbol_prices(directory, name, years, months):
+    """
+    Read every processed_<name>-aggTrades-YYYY-MM.csv file of one symbol once, in time order.
+
+    Returns:
+    - A tuple of (timestamps, prices), with timestamps as int64 nanoseconds. Both are empty
+      if the symbol has no files.
+    """
+    timestamps, prices = [], []
+    for year in years:
+        for month in months:
+            filepath = os.path.join(directory, f"processed_{name}-aggTrades-{year}-{month:02d}.csv")
+            if not os.path.exists(filepath):
+                print(f"File does not exist: {filepath}")
+                continue
+            df = pd.read_csv(filepath)
+            timestamps.append(pd.to_datetime(df['timestamp']).values.astype('datetime64[ns]').astype('int64'))
+            prices.append(df['weighted_avg_price'].values.astype(float))
+            print(f"Read file: {filepath}")
+    if not timestamps:
+        return np.empty(0, dtype='int64'), np.empty(0)
+
+    timestamps, prices = np.concatenate(timestamps), np.concatenate(prices)
+    if np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, prices = timestamps[order], prices[order]
+    return timestamps, prices
+
+def shared_grid(timestamp_arrays, resolution='1s'):
+    """
+    Shared timestamp grid of several series.
+
+    Parameters:
+    - timestamp_arrays: Sorted int64 nanosecond timestamps of every series.
+    - resolution: Spacing of a regular grid from the first to the last timestamp, so every
+                  row is one step (what the row-count windows assume). None uses the union
+                  of all timestamps instead, like the outer merge of data_merging.
+
+    Returns:
+    - Sorted int64 nanosecond timestamps of the grid.
+    """
+    timestamp_arrays = [timestamps for timestamps in timestamp_arrays if len(timestamps)]
+    if not timestamp_arrays:
+        return np.empty(0, dtype='int64')
+    if resolution is None:
+        return np.unique(np.concatenate(timestamp_arrays))
+    step = pd.Timedelta(resolution).value
+    first = min(timestamps[0] for timestamps in timestamp_arrays) // step * step
+    last = max(timestamps[-1] for timestamps in timestamp_arrays)
+    return np.arange(first, last + 1, step, dtype='int64')
+
+def align_to_grid(timestamps, prices, grid):
+    """
+    Price of one series on every grid timestamp: the last price at or before it, and the
+    first price for grid timestamps before the series starts (the ffill/bfill of the outer merge).
+    Of several prices on the same timestamp, the last one is used.
+    """
+    positions = np.searchsorted(timestamps, grid, side='right') - 1
+    return prices[np.maximum(positions, 0)]
+
+def _park(directory, name, array):
+    # Save an array to a temporary .npy file and return it memory-mapped
+    path = os.path.join(directory, f"{name}.npy")
+    np.save(path, array)
+    return np.load(path, mmap_mode='r')
+
+def build_spread_matrix(spot_directory, future_directory, spot_names, future_names, years, months, output_directory, resolution='1s'):
+    """
+    Align every spot and future series once onto a shared grid and write the spreads of all
+    spot x future pairs as one 2-D array (time x pair).
+
+    Every symbol is read once, however many pairs it is part of. Its prices and then its
+    aligned column are parked in memory-mapped temporary files, and the spreads are written
+    column by column into a Fortran-ordered .npy file, so each pair's spread is contiguous on
+    disk. Memory holds the grid and a few columns at a time, whatever the number of symbols
+    and pairs.
+
+    Parameters:
+    - spot_directory, future_directory: Directories of the processed aggTrades files.
+    - spot_names, future_names: Symbols; every spot is paired with every future.
+    - years, months: Months to read.
+    - output_directory: Directory for timestamps.npy, spreads.npy and pairs.json.
+    - resolution: Grid spacing, or None for the union of all timestamps (see shared_grid).
+
+    Returns:
+    - The output directory.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_directory) as work_directory:
+        # Read every symbol once; only the grid needs all of them at the same time
+        prices = {}
+        for leg, directory, names in (('spot', spot_directory, spot_names), ('future', future_directory, future_names)):
+            for name in dict.fromkeys(names):
+                timestamps, symbol_prices = read_symbol_prices(directory, name, years, months)
+                if len(timestamps):
+                    prices[leg, name] = (_park(work_directory, f"{leg}-{name}-timestamps", timestamps),
+                                         _park(work_directory, f"{leg}-{name}-prices", symbol_prices))
+                del timestamps, symbol_prices
+
+        grid = shared_grid([timestamps for timestamps, _ in prices.values()], resolution)
+        np.save(os.path.join(output_directory, 'timestamps.npy'), grid)
+
+        # Align every symbol once; the pairs only combine the aligned columns
+        aligned = {(leg, name): _park(work_directory, f"{leg}-{name}-aligned", align_to_grid(timestamps, symbol_prices, grid))
+                   for (leg, name), (timestamps, symbol_prices) in prices.items()}
+        del prices
+
+        pairs = [(spot_name, future_name) for leg, spot_name in aligned if leg == 'spot' for other, future_name in aligned if other == 'future']
+        spreads = np.lib.format.open_memmap(os.path.join(output_directory, 'spreads.npy'), mode='w+', dtype='float64',
+                                            shape=(len(grid), len(pairs)), fortran_order=True)
+        for column, (spot_name, future_name) in enumerate(pairs):
+            spreads[:, column] = (aligned['future', future_name] - aligned['spot', spot_name]) / aligned['spot', spot_name]
+        spreads.flush()
+        # The temporary files are only removed once nothing maps them any more
+        del spreads, aligned
+
+    with open(os.path.join(output_directory, 'pairs.json'), 'w') as f:
+        json.dump({'pairs': [f"{spot_name}-{future_name}" for spot_name, future_name in pairs], 'resolution': resolution}, f, indent=2)
+    print(f"Spread matrix saved: {output_directory} ({len(grid)} rows x {len(pairs)} pairs)")
+    return output_directory
+
+def load_spread_matrix(directory, mmap_mode='r'):
+    """
+    Open a spread matrix written by build_spread_matrix.
+
+    Returns:
+    - A tuple of (timestamps, pairs, spreads): datetime64[ns] timestamps, the list of
+      '<spot>-<future>' pair names and the (time x pair) spread array, memory-mapped by default.
+    """
+    timestamps = np.load(os.path.join(directory, 'timestamps.npy')).view('datetime64[ns]')
+    with open(os.path.join(directory, 'pairs.json')) as f:
+        pairs = json.load(f)['pairs']
+    spreads = np.load(os.path.join(directory, 'spreads.npy'), mmap_mode=mmap_mode)
+    return timestamps, pairs, spreads
+
+def rolling_means(spreads, window):
+    """
+    Rolling mean of every pair's spread over `window` rows, in one pass over the 2-D array.
+    Gives the same values as merged_data['spread'].rolling(window=window).mean() per pair.
+    """
+    return pd.DataFrame(np.asarray(spreads)).rolling(window=window).mean().values
+
+def rolling_stds(spreads, window):
+    """
+    Rolling standard deviation of every pair's spread over `window` rows, in one pass.
+    """
+    return pd.DataFrame(np.asarray(spreads)).rolling(window=window).std().values
+
+def _init_worker(directory):
+    # Spread matrix opened once per worker process
+    parallel.shared['timestamps'], parallel.shared['pairs'], parallel.shared['spreads'] = load_spread_matrix(directory)
+
+def _backtest_pair(column, mean_n, threshold, rolling_mean_window, dump_file_directory):
+    timestamps, pair = parallel.shared['timestamps'], parallel.shared['pairs'][column]
+    # The matrix is Fortran-ordered, so one pair's column is a contiguous read
+    spreads = np.array(parallel.shared['spreads'][:, column])
+    if rolling_statistics.is_time_window(mean_n):
+        rolling_mean = rolling_statistics.time_rolling_mean(timestamps, spreads, mean_n)
+    else:
+        rolling_mean = pd.Series(spreads).rolling(window=mean_n).mean().values
+    signal_start_times, signal_end_times, signal_durations = trading_signal_analysis.detect_signals(
+        timestamps, spreads, rolling_mean + threshold, rolling_mean - threshold, rolling_statistics.first_full_window(timestamps, mean_n))
+
+    if dump_file_directory is not None:
+        pair_directory = os.path.join(dump_file_directory, pair)
+        os.makedirs(pair_directory, exist_ok=True)
+        pd.DataFrame({'Start': signal_start_times, 'End': signal_end_times, 'Duration': signal_durations}).to_csv(
+            os.path.join(pair_directory, f"signal_durations_{rolling_mean_window}.csv"), index=False)
+
+    metrics = trading_signal_analysis.calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+    return {'Pair': pair, **metrics}
+
+def backtest_all_pairs(matrix_directory, mean_n, threshold, rolling_mean_window, dump_file_directory=None, max_workers=None):
+    """
+    Run the trading signal backtest of modified_optimized_backtest_arbitrage_strategy on
+    every pair of a spread matrix, one pair per task in a pool of worker processes.
+
+    Workers memory-map the matrix instead of receiving a copy, so memory grows with the
+    number of workers, not with the number of pairs.
+
+    Parameters:
+    - matrix_directory: Directory written by build_spread_matrix.
+    - mean_n: Rolling mean window, in rows or as a duration like '15min'.
+    - threshold: Spread threshold around the rolling mean.
+    - rolling_mean_window: Label used in the metrics and file names.
+    - dump_file_directory: Optional directory; the signals of each pair are written to
+                           <pair>/signal_durations_<window>.csv inside it.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 runs every pair in the current process.
+
+    Returns:
+    - A DataFrame with one row of metrics per pair.
+    """
+    with open(os.path.join(matrix_directory, 'pairs.json')) as f:
+        columns = list(range(len(json.load(f)['pairs'])))
+    tasks = [(column, mean_n, threshold, rolling_mean_window, dump_file_directory) for column in columns]
+
+    results = parallel.run_tasks(_backtest_pair, tasks, max_workers, _init_worker, (matrix_directory,))
+    return pd.DataFrame(results)
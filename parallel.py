@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# State shared by every task of a run; set once per worker process by the initializer given to run_tasks
+shared = {}
+
+def run_tasks(function, tasks, max_workers=None, initializer=None, initargs=(), chunksize=1):
+    """
+    Call a function on every task in a pool of worker processes.
+
+    The initializer runs once per worker and usually loads what all tasks read into
+    `shared`, so large arrays are sent (or memory-mapped) once per worker instead of once
+    per task. With max_workers=1 everything runs in the current process, and `shared` is
+    cleared afterwards.
+
+    Parameters:
+    - function: Module-level function, called as function(*task).
+    - tasks: List of argument tuples.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 runs the tasks in the current process.
+    - initializer: Optional function called with initargs before the tasks.
+    - initargs: Arguments of the initializer.
+    - chunksize: Number of consecutive tasks sent to a worker at once.
+
+    Returns:
+    - The list of results, in the order of the tasks.
+    """
+    tasks = list(tasks)
+    if max_workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        try:
+            return [function(*task) for task in tasks]
+        finally:
+            shared.clear()
+    if not tasks:
+        return []
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(function, *zip(*tasks), chunksize=chunksize))
@@ -0,0 +1,70 @@
+import pandas as pd
+import rolling_statistics
+import trading_signal_analysis
+import parallel
+
+def _init_worker(timestamps, spreads, prefix):
+    # Series shared by every task of a sweep
+    parallel.shared['timestamps'] = timestamps
+    parallel.shared['spreads'] = spreads
+    parallel.shared['prefix'] = prefix
+    parallel.shared['rolling_means'] = {}
+
+def _rolling_mean(mean_n):
+    # Tasks are submitted window by window, so only the latest window's mean is kept in memory
+    rolling_means = parallel.shared['rolling_means']
+    if mean_n not in rolling_means:
+        rolling_means.clear()
+        if rolling_statistics.is_time_window(mean_n):
+            rolling_means[mean_n] = rolling_statistics.time_rolling_mean(parallel.shared['timestamps'], window=mean_n, prefix=parallel.shared['prefix'])
+        else:
+            rolling_means[mean_n] = rolling_statistics.rolling_mean(parallel.shared['prefix'], mean_n)
+    return rolling_means[mean_n]
+
+def _evaluate(mean_n, rolling_mean_window, threshold):
+    rolling_mean = _rolling_mean(mean_n)
+    _, _, signal_durations = trading_signal_analysis.detect_signals(
+        parallel.shared['timestamps'], parallel.shared['spreads'], rolling_mean + threshold, rolling_mean - threshold,
+        rolling_statistics.first_full_window(parallel.shared['timestamps'], mean_n))
+
+    return trading_signal_analysis.calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+
+def sweep(spreads, windows, thresholds, max_workers=None):
+    """
+    Evaluate the trading signal strategy over a grid of rolling mean windows and thresholds.
+
+    Prefix sums of the spread are built once and every window's rolling mean is derived
+    from them, instead of re-reading the timestamps and re-running a rolling mean per call.
+    Nothing is plotted or written to disk.
+
+    Parameters:
+    - spreads: DataFrame with 'timestamp' and 'spread' columns.
+    - windows: List of rolling mean windows, in rows or as durations like '15min' (see
+               rolling_statistics.time_window_bounds), either plain or as
+               (mean_n, rolling_mean_window) tuples like the notebook's means_list.
+    - thresholds: List of spread thresholds.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 runs the grid in the current process.
+
+    Returns:
+    - A DataFrame with one row of calculate_trade_durations_statistics metrics per
+      (window, threshold) pair.
+    """
+    windows = [window if isinstance(window, tuple) else (window, window) for window in windows]
+
+    timestamps = spreads['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+    timestamps = timestamps.values
+    spread_values = spreads['spread'].values.astype(float)
+    prefix = rolling_statistics.cumulative_sums(spread_values)
+
+    grid = [(mean_n, rolling_mean_window, threshold) for mean_n, rolling_mean_window in windows for threshold in thresholds]
+    if not grid:
+        return pd.DataFrame()
+
+    # Group consecutive tasks of the same window on one worker so its rolling mean is reused
+    results = parallel.run_tasks(_evaluate, grid, max_workers, _init_worker, (timestamps, spread_values, prefix),
+                                 chunksize=max(len(thresholds), 1))
+
+    return pd.DataFrame(results)
@@ -0,0 +1,198 @@
+import pandas as pd
+import numpy as np
+import rolling_statistics
+import holding_position_analysis
+
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 10**9
+
+# Fee rates per leg as a fraction of traded notional (Binance regular tier)
+DEFAULT_FEES = {
+    'spot': {'maker': 0.001, 'taker': 0.001},
+    'future': {'maker': 0.0002, 'taker': 0.0005},
+}
+
+# Binance perpetual futures settle funding every 8 hours (00:00, 08:00 and 16:00 UTC)
+FUNDING_INTERVAL = '8h'
+
+def held_positions(entry_indices, positions, n):
+    """
+    Position held after every row: 0 before the first entry, then the side of the last entry.
+
+    Returns:
+    - A tuple of (held, segment), where segment is the index of the last entry at or before
+      every row (-1 before the first entry).
+    """
+    segment = np.searchsorted(entry_indices, np.arange(n), side='right') - 1
+    held = np.where(segment >= 0, np.asarray(positions)[np.maximum(segment, 0)], 0)
+    return held, segment
+
+def funding_payments(timestamps, future_quantity, future_prices, funding_rate, interval=FUNDING_INTERVAL):
+    """
+    Funding paid on the future leg at every funding time crossed between two rows.
+
+    A long future position pays funding when the rate is positive and a short one receives
+    it. The position held before the crossing is charged at the price of the crossing row.
+
+    Parameters:
+    - timestamps: datetime64[ns] array of the rows.
+    - future_quantity: Future quantity held after every row (negative when short).
+    - future_prices: Future price of every row.
+    - funding_rate: Constant rate per interval, or a Series of rates indexed by funding time.
+    - interval: Funding interval.
+
+    Returns:
+    - Array with the funding paid at every row (positive is a cost).
+    """
+    interval_ns = pd.Timedelta(interval).value
+    periods = timestamps.astype('int64') // interval_ns
+    crossed = np.zeros(len(periods), dtype='int64')
+    crossed[1:] = np.diff(periods)
+    rows = np.flatnonzero(crossed)
+
+    if isinstance(funding_rate, pd.Series):
+        funding_times = pd.to_datetime(periods[rows] * interval_ns)
+        rates = funding_rate.sort_index().reindex(funding_times, method='ffill').fillna(0).values
+    else:
+        rates = np.full(len(rows), float(funding_rate))
+
+    payments = np.zeros(len(periods))
+    payments[rows] = future_quantity[rows - 1] * future_prices[rows] * rates * crossed[rows]
+    return payments
+
+def backtest_arbitrage_pnl(mean_n, merged_data, threshold, rolling_mean_window, capital=10_000.0, leg_notional=None, fees=None,
+                           maker_ratio=0.0, spot_slippage=0.0002, future_slippage=0.0002, funding_rate=0.0001, close_at_end=True,
+                           first_index=None):
+    """
+    Mark the long/short positions of the flip state machine to market on both legs and
+    account for fees, slippage and funding, all with array operations.
+
+    A long spread position buys leg_notional of future and sells leg_notional of spot, a
+    short one does the opposite. Quantities are fixed at every entry and held until the
+    next flip, which closes the position and opens the opposite one on the same row. Trades
+    fill at the weighted average price of the signal row plus slippage.
+
+    Parameters:
+    - mean_n: Rolling mean window over the previous rows, in rows or as a duration like '15min'.
+    - merged_data: Merged DataFrame with 'timestamp', 'weighted_avg_price_spot' and
+                   'weighted_avg_price_future' (and optionally 'spread').
+    - threshold: Spread threshold around the rolling mean.
+    - rolling_mean_window: Label reported in the metrics.
+    - capital: Starting equity.
+    - leg_notional: Quote notional of each leg at entry, defaults to capital.
+    - fees: Fee rates per leg and order type, defaults to DEFAULT_FEES.
+    - maker_ratio: Fraction of the traded notional filled as maker.
+    - spot_slippage, future_slippage: Slippage per leg as a fraction of the traded notional.
+    - funding_rate: Funding rate per FUNDING_INTERVAL, constant or a Series indexed by funding time.
+    - close_at_end: Charge the costs of closing the last open position at the last row.
+    - first_index: First row allowed to open a position, by default the one-week warm-up of the holding backtest.
+
+    Returns:
+    - A tuple of (metrics, equity_df). equity_df has one row per input row with the
+      position, the mark-to-market P&L, the costs and the equity. The metrics of a run whose
+      equity reaches zero stop at the ruin (see performance_metrics).
+    """
+    fees = fees or DEFAULT_FEES
+    leg_notional = capital if leg_notional is None else leg_notional
+
+    timestamps = pd.to_datetime(merged_data['timestamp']).values.astype('datetime64[ns]')
+    # Rows where one leg has no trade keep the last known price of that leg
+    spot = pd.Series(merged_data['weighted_avg_price_spot'].values, dtype=float).ffill().values
+    future = pd.Series(merged_data['weighted_avg_price_future'].values, dtype=float).ffill().values
+    if 'spread' in merged_data:
+        spreads = merged_data['spread'].values.astype(float)
+    else:
+        spreads = (future - spot) / spot
+    n = len(spreads)
+
+    if rolling_statistics.is_time_window(mean_n):
+        mean_min = rolling_statistics.time_trailing_mean(timestamps, spreads, mean_n)
+    else:
+        mean_min = rolling_statistics.trailing_mean(spreads, mean_n)
+    if first_index is None:
+        first_index = holding_position_analysis.warm_up_index(timestamps, mean_n)
+    entry_indices, positions = holding_position_analysis.detect_position_flips(spreads, mean_min, threshold, first_index)
+    held, segment = held_positions(entry_indices, positions, n)
+
+    # Quantities bought at the prices of the entry row and held until the next flip
+    entries = entry_indices[np.maximum(segment, 0)] if len(entry_indices) else np.zeros(n, dtype='int64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        future_quantity = np.where(held != 0, held * leg_notional / future[entries], 0.0)
+        spot_quantity = np.where(held != 0, -held * leg_notional / spot[entries], 0.0)
+
+    # Mark to market: the holdings after row t-1 earn the price change from t-1 to t
+    pnl = np.zeros(n)
+    if n > 1:
+        pnl[1:] = future_quantity[:-1] * np.diff(future) + spot_quantity[:-1] * np.diff(spot)
+    pnl = np.nan_to_num(pnl)
+
+    future_traded = np.abs(np.diff(future_quantity, prepend=0.0)) * future
+    spot_traded = np.abs(np.diff(spot_quantity, prepend=0.0)) * spot
+    if close_at_end and n:
+        future_traded[-1] += np.abs(future_quantity[-1]) * future[-1]
+        spot_traded[-1] += np.abs(spot_quantity[-1]) * spot[-1]
+    future_traded = np.nan_to_num(future_traded)
+    spot_traded = np.nan_to_num(spot_traded)
+
+    def fee_rate(leg):
+        return maker_ratio * fees[leg]['maker'] + (1 - maker_ratio) * fees[leg]['taker']
+
+    fee_costs = future_traded * fee_rate('future') + spot_traded * fee_rate('spot')
+    slippage_costs = future_traded * future_slippage + spot_traded * spot_slippage
+    funding_costs = np.nan_to_num(funding_payments(timestamps, future_quantity, future, funding_rate))
+    costs = fee_costs + slippage_costs + funding_costs
+    equity = capital + np.cumsum(pnl - costs)
+
+    equity_df = pd.DataFrame({'timestamp': timestamps, 'position': held, 'pnl': pnl, 'costs': costs, 'equity': equity})
+    metrics = {
+        'Rolling Mean Window': rolling_mean_window,
+        'Spread Threshold': threshold,
+        'Trade Count': len(entry_indices),
+        **performance_metrics(timestamps, equity, capital, future_traded + spot_traded),
+        'Fees': fee_costs.sum(),
+        'Slippage': slippage_costs.sum(),
+        'Funding': funding_costs.sum(),
+    }
+    return metrics, equity_df
+
+def performance_metrics(timestamps, equity, capital, traded_notional):
+    """
+    Total return, annualized Sharpe ratio of daily returns, maximum drawdown and turnover of an equity curve.
+
+    A curve that reaches zero equity is ruined: it stops there, so the total return and the
+    maximum drawdown are -100%, and its Sharpe ratio is NaN rather than computed from
+    returns on a non-positive equity. 'Ruin Time' is the timestamp of the first row at or
+    below zero, or None.
+
+    Parameters:
+    - timestamps: datetime64[ns] array of the rows.
+    - equity: Equity after every row.
+    - capital: Starting equity.
+    - traded_notional: Notional traded on every row.
+    """
+    if len(equity) == 0:
+        return {'Total Return': 0.0, 'Sharpe Ratio': np.nan, 'Max Drawdown': 0.0, 'Turnover': 0.0, 'Ruin Time': None}
+
+    ruined = np.flatnonzero(equity <= 0)
+    if len(ruined):
+        # Trading stops at ruin: the rest of the curve would compound on a negative base
+        ruin = ruined[0]
+        turnover = np.sum(traded_notional[:ruin + 1]) / capital
+        return {'Total Return': -1.0, 'Sharpe Ratio': np.nan, 'Max Drawdown': -1.0, 'Turnover': turnover,
+                'Ruin Time': pd.Timestamp(timestamps[ruin])}
+
+    # Equity at the last row of every day
+    days = np.asarray(timestamps).astype('datetime64[ns]').astype('int64') // NANOSECONDS_PER_DAY
+    day_ends = np.r_[np.flatnonzero(days[1:] != days[:-1]), len(days) - 1]
+    daily_equity = np.r_[capital, equity[day_ends]]
+    daily_returns = np.diff(daily_equity) / daily_equity[:-1]
+    std = daily_returns.std(ddof=1) if len(daily_returns) > 1 else 0.0
+    sharpe = daily_returns.mean() / std * np.sqrt(365) if std > 0 else np.nan
+
+    drawdown = equity / np.maximum.accumulate(np.r_[capital, equity])[1:] - 1
+    return {
+        'Total Return': equity[-1] / capital - 1,
+        'Sharpe Ratio': sharpe,
+        'Max Drawdown': drawdown.min(),
+        'Turnover': np.sum(traded_notional) / capital,
+        'Ruin Time': None,
+    }
@@ -0,0 +1,139 @@
+import os
+import json
+import zipfile
+import hashlib
+import numpy as np
+
+# Directory of the default cache; unset disables caching
+CACHE_ENV = 'PIPELINE_CACHE'
+# Bump when the cached computations change, so stale results are never returned
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 4 * 2**30
+
+def fingerprint(*arrays):
+    """
+    Content hash of one or more arrays: their dtype, shape and bytes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+def cache_key(kind, data_fingerprint, **parameters):
+    """
+    Key of a result: what was computed, on which data, with which parameters.
+    """
+    description = json.dumps({'kind': kind, 'data': data_fingerprint, 'version': CACHE_VERSION,
+                              'parameters': {name: str(value) for name, value in parameters.items()}}, sort_keys=True)
+    return f"{kind}-{hashlib.blake2b(description.encode(), digest_size=16).hexdigest()}"
+
+def json_value(value):
+    """
+    Plain Python value of a numpy scalar, so it can be stored as JSON metadata.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+class ResultCache:
+    """
+    On-disk cache of arrays and small JSON metadata, keyed by cache_key.
+
+    Every entry is one uncompressed .npz file, loaded without pickling. Reading an entry
+    refreshes its modification time, and once the cache grows past max_bytes the least
+    recently used entries are deleted.
+
+    Parameters:
+    - directory: Directory of the cache.
+    - max_bytes: Size the cache is trimmed to after every write.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Return (arrays, metadata) of an entry, or None if it is not cached. A truncated or
+        corrupt entry is deleted and counts as not cached.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != '__metadata__'}
+                metadata = json.loads(str(data['__metadata__'])) if '__metadata__' in data.files else {}
+        except FileNotFoundError:
+            return None
+        except (zipfile.BadZipFile, ValueError, EOFError, KeyError, OSError):
+            self._remove(path)
+            return None
+        os.utime(path)
+        return arrays, metadata
+
+    def put(self, key, arrays, metadata=None):
+        """
+        Store arrays (a dictionary of name to array) and JSON-serializable metadata.
+        """
+        path = self._path(key)
+        # np.savez appends .npz to names without it, so the temporary name keeps the suffix
+        temporary_path = f"{path[:-4]}.tmp-{os.getpid()}.npz"
+        np.savez(temporary_path, __metadata__=np.array(json.dumps(metadata or {}, default=json_value)), **arrays)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    @staticmethod
+    def _remove(path):
+        # Another process may have removed the entry already
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.npz') and '.tmp-' not in filename:
+                path = os.path.join(self.directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.npz'):
+                os.remove(os.path.join(self.directory, filename))
+
+def default_cache():
+    """
+    The cache in the PIPELINE_CACHE directory, or None when the variable is not set.
+    """
+    directory = os.environ.get(CACHE_ENV)
+    return ResultCache(directory) if directory else None
+
+def resolve(cache):
+    """
+    Turn the `cache` argument of the pipeline functions into a ResultCache or None:
+    None uses default_cache(), False disables caching and a path opens a cache there.
+    """
+    if cache is None:
+        return default_cache()
+    if cache is False:
+        return None
+    if isinstance(cache, (str, os.PathLike)):
+        return ResultCache(cache)
+    return cache
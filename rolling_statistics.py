@@ -0,0 +1,347 @@
+import math
+import datetime
+import pandas as pd
+import numpy as np
+
+class RollingMean:
+    """
+    Incremental rolling mean with the same arithmetic as pandas' rolling(window).mean().
+
+    pandas updates a fixed window by removing the values that leave it and adding the
+    values that enter it, each with its own Kahan compensation, and corrects the result
+    for runs of identical values and for windows of a single sign. Repeating those steps
+    value by value gives bit-identical means, so a live stream and a batch backtest over
+    the same rows make the same decisions.
+
+    Parameters:
+    - window: Number of rows in the window. Means are NaN until `window` valid values are seen.
+    """
+    __slots__ = ('window', 'values', 'position', 'size', 'count', 'negative_count', 'sum',
+                 'add_compensation', 'remove_compensation', 'same_value_count', 'previous_value')
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        self.window = window
+        self.values = [float('nan')] * window
+        self.position = 0  # next slot of the ring buffer to overwrite
+        self.size = 0  # number of slots filled so far
+        self.count = 0  # number of non-NaN values in the window
+        self.negative_count = 0
+        self.sum = 0.0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.same_value_count = 0
+        self.previous_value = float('nan')
+
+    def push(self, value):
+        """
+        Add a value to the window, dropping the oldest one once the window is full.
+
+        Returns:
+        - The mean of the window, or NaN while it holds fewer than `window` valid values.
+        """
+        value = float(value)
+        if self.size == self.window:
+            oldest = self.values[self.position]
+            if oldest == oldest:
+                self.count -= 1
+                y = -oldest - self.remove_compensation
+                t = self.sum + y
+                self.remove_compensation = t - self.sum - y
+                self.sum = t
+                if math.copysign(1.0, oldest) < 0:
+                    self.negative_count -= 1
+        else:
+            self.size += 1
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.window
+
+        if value == value:
+            self.count += 1
+            y = value - self.add_compensation
+            t = self.sum + y
+            self.add_compensation = t - self.sum - y
+            self.sum = t
+            if math.copysign(1.0, value) < 0:
+                self.negative_count += 1
+            # Counting repeats of the same value lets a constant window return that value exactly
+            if value == self.previous_value:
+                self.same_value_count += 1
+            else:
+                self.same_value_count = 1
+            self.previous_value = value
+
+        if self.count < self.window:
+            return float('nan')
+        if self.same_value_count >= self.count:
+            return self.previous_value
+        mean = self.sum / self.count
+        if self.negative_count == 0 and mean < 0:
+            return 0.0
+        if self.negative_count == self.count and mean > 0:
+            return 0.0
+        return mean
+
+    def state(self):
+        """
+        Checkpoint of the window: a JSON-serializable dictionary of its counters and sums,
+        and an array of the values it holds.
+        """
+        scalars = {name: getattr(self, name) for name in self.__slots__ if name != 'values'}
+        return scalars, np.array(self.values, dtype=float)
+
+    @classmethod
+    def from_state(cls, scalars, values):
+        """
+        Rebuild a RollingMean from state(), so it continues bit for bit where it stopped.
+        """
+        rolling_mean = cls(scalars['window'])
+        for name, value in scalars.items():
+            setattr(rolling_mean, name, value)
+        rolling_mean.values = np.asarray(values, dtype=float).tolist()
+        return rolling_mean
+
+class TrailingMean:
+    """
+    Incremental mean of the previous `window` values, with the same arithmetic as
+    trailing_mean: running sums of the values shifted by the first valid value, differenced
+    over the window.
+
+    The first `window` rows give NaN. trailing_mean wraps those rows around to the end of
+    the series like iloc does, which only gives them a value when the series is shorter
+    than the window (n < window).
+
+    Parameters:
+    - window: Number of previous rows averaged.
+    """
+    __slots__ = ('window', 'sums', 'counts', 'position', 'size', 'shift', 'sum', 'count')
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        self.window = window
+        # Prefix sums and counts of the last window + 1 rows, like cumulative_sums
+        self.sums = [0.0] * (window + 1)
+        self.counts = [0] * (window + 1)
+        self.position = 1
+        self.size = 1
+        self.shift = None
+        self.sum = 0.0
+        self.count = 0
+
+    def push(self, value):
+        """
+        Return the mean of the previous `window` values, then add `value`.
+        """
+        window = self.window
+        if self.size > window:
+            oldest = self.position % (window + 1)
+            latest = (self.position - 1) % (window + 1)
+            count = self.counts[latest] - self.counts[oldest]
+            mean = (self.sums[latest] - self.sums[oldest]) / count + self.shift if count >= 1 else float('nan')
+        else:
+            mean = float('nan')
+
+        value = float(value)
+        if value == value:
+            if self.shift is None:
+                self.shift = value
+            self.sum += value - self.shift
+            self.count += 1
+        self.sums[self.position % (window + 1)] = self.sum
+        self.counts[self.position % (window + 1)] = self.count
+        self.position += 1
+        self.size = min(self.size + 1, window + 1)
+        return mean
+
+    def state(self):
+        """
+        Checkpoint of the window: a JSON-serializable dictionary of its counters and sums,
+        and an array holding the prefix sums and counts of the last window + 1 rows.
+        """
+        scalars = {name: getattr(self, name) for name in self.__slots__ if name not in ('sums', 'counts')}
+        return scalars, np.array([self.sums, self.counts], dtype=float)
+
+    @classmethod
+    def from_state(cls, scalars, values):
+        """
+        Rebuild a TrailingMean from state(), so it continues bit for bit where it stopped.
+        """
+        trailing_mean = cls(scalars['window'])
+        for name, value in scalars.items():
+            setattr(trailing_mean, name, value)
+        sums, counts = np.asarray(values, dtype=float)
+        trailing_mean.sums = sums.tolist()
+        trailing_mean.counts = counts.astype('int64').tolist()
+        return trailing_mean
+
+def cumulative_sums(values, with_squares=False):
+    """
+    Build prefix sums that give the sum, count and sum of squares of any slice in O(1).
+
+    NaN values are left out of the sums and the counts. Values are shifted by their first
+    valid value before summing, which keeps the rounding error small for spread series
+    whose deviations are tiny compared to their level.
+
+    Parameters:
+    - values: 1-D array of values.
+    - with_squares: Also return prefix sums of squares, needed for the standard deviation.
+
+    Returns:
+    - A dictionary with 'shift', 'sums', 'counts' and optionally 'squares'. Each array
+      has len(values) + 1 entries, entry k covering values[:k].
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    shift = values[valid][0] if valid.any() else 0.0
+    shifted = np.where(valid, values - shift, 0.0)
+
+    prefix = {
+        'shift': shift,
+        'sums': np.concatenate(([0.0], np.cumsum(shifted))),
+        'counts': np.concatenate(([0], np.cumsum(valid))),
+    }
+    if with_squares:
+        prefix['squares'] = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    return prefix
+
+def window_mean(prefix, starts, ends, min_periods=1):
+    """
+    Mean of values[starts[k]:ends[k]] for every k, from prefix sums.
+    Windows with fewer than `min_periods` valid values give NaN.
+    """
+    counts = prefix['counts'][ends] - prefix['counts'][starts]
+    sums = prefix['sums'][ends] - prefix['sums'][starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    means[counts < max(min_periods, 1)] = np.nan
+    return means + prefix['shift']
+
+def window_std(prefix, starts, ends, ddof=1):
+    """
+    Standard deviation of values[starts[k]:ends[k]] for every k, from prefix sums.
+    Requires prefix sums built with with_squares=True.
+    """
+    counts = prefix['counts'][ends] - prefix['counts'][starts]
+    sums = prefix['sums'][ends] - prefix['sums'][starts]
+    squares = prefix['squares'][ends] - prefix['squares'][starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / counts) / (counts - ddof)
+    variance[counts <= ddof] = np.nan
+    return np.sqrt(np.maximum(variance, 0.0))
+
+def trailing_window_bounds(n, window):
+    """
+    Start and end positions of values.iloc[i-window:i] for every row i.
+
+    The current row is excluded. A negative start follows Python slicing, so it
+    wraps around to the end of the series exactly like `iloc` does.
+    """
+    ends = np.arange(n)
+    starts = ends - window
+    wrapped = starts < 0
+    starts[wrapped] = np.maximum(starts[wrapped] + n, 0)
+    # Slices whose start is past their end are empty
+    starts = np.minimum(starts, ends)
+    return starts, ends
+
+def trailing_mean(values, window):
+    """
+    Mean of the previous `window` values for every row, i.e. values.iloc[i-window:i].mean(),
+    computed for all rows in O(N) total.
+    """
+    starts, ends = trailing_window_bounds(len(values), window)
+    return window_mean(cumulative_sums(values), starts, ends)
+
+def rolling_window_bounds(n, window):
+    """
+    Start and end positions of the window ending at (and including) every row i,
+    the same rows that values.rolling(window) uses.
+    """
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(ends - window, 0)
+    return starts, ends
+
+def rolling_mean(prefix, window):
+    """
+    Same as values.rolling(window).mean() up to floating point rounding, computed from
+    prefix sums so that many windows can share one pass over the data.
+
+    Parameters:
+    - prefix: Prefix sums from cumulative_sums.
+    - window: Number of rows in the window. Rows without `window` valid values give NaN.
+    """
+    starts, ends = rolling_window_bounds(len(prefix['counts']) - 1, window)
+    return window_mean(prefix, starts, ends, min_periods=window)
+
+def is_time_window(window):
+    """
+    Whether a window is a duration like '15min', '14D' or a Timedelta rather than a row count.
+    """
+    return isinstance(window, (str, pd.Timedelta, np.timedelta64, datetime.timedelta))
+
+def _nanoseconds(timestamps):
+    return np.asarray(timestamps).astype('datetime64[ns]').astype('int64')
+
+def time_window_bounds(timestamps, window, closed='right'):
+    """
+    Start and end positions of the rows within a duration of every row, for sorted and
+    possibly irregular timestamps.
+
+    The window starts are found by searching every shifted timestamp in the sorted
+    timestamps at once, a vectorized two-pointer sweep, so the window length does not
+    affect the cost and gaps or sub-second rows need no special handling.
+
+    Parameters:
+    - timestamps: Sorted datetime64 timestamps.
+    - window: Duration, e.g. '15min' or '14D'.
+    - closed: 'right' for the rows in (t - window, t] including row i, like
+              values.rolling(window, on=timestamps); 'left' for the previous rows in
+              [t - window, t), the time-based counterpart of trailing_window_bounds
+              (earlier rows sharing row i's timestamp count as previous rows).
+    """
+    times = _nanoseconds(timestamps)
+    width = pd.Timedelta(window).value
+    if width <= 0:
+        raise ValueError(f"window must be a positive duration, got '{window}'")
+    if closed == 'right':
+        return np.searchsorted(times, times - width, side='right'), np.arange(1, len(times) + 1)
+    if closed == 'left':
+        return np.searchsorted(times, times - width, side='left'), np.arange(len(times))
+    raise ValueError(f"Unknown closed '{closed}', expected 'right' or 'left'")
+
+def time_rolling_mean(timestamps, values=None, window=None, prefix=None):
+    """
+    Mean of the rows in (t - window, t] for every row, in O(N) total for any duration.
+    Pass `prefix` from cumulative_sums instead of `values` to share it between windows.
+    """
+    prefix = prefix if prefix is not None else cumulative_sums(values)
+    starts, ends = time_window_bounds(timestamps, window, closed='right')
+    return window_mean(prefix, starts, ends)
+
+def time_rolling_std(timestamps, values, window, ddof=1):
+    """
+    Standard deviation of the rows in (t - window, t] for every row, in O(N) total.
+    """
+    starts, ends = time_window_bounds(timestamps, window, closed='right')
+    return window_std(cumulative_sums(values, with_squares=True), starts, ends, ddof=ddof)
+
+def time_trailing_mean(timestamps, values, window):
+    """
+    Mean of the previous rows in [t - window, t) for every row, in O(N) total.
+    """
+    starts, ends = time_window_bounds(timestamps, window, closed='left')
+    return window_mean(cumulative_sums(values), starts, ends)
+
+def first_full_window(timestamps, window):
+    """
+    First row whose window is fully inside the data: row window - 1 for a row count, and
+    the first row at least `window` after the first timestamp for a duration.
+    """
+    if not is_time_window(window):
+        return window - 1
+    times = _nanoseconds(timestamps)
+    if len(times) == 0:
+        return 0
+    return int(np.searchsorted(times, times[0] + pd.Timedelta(window).value, side='left'))
@@ -0,0 +1,172 @@
+import os
+import json
+import pandas as pd
+import numpy as np
+
+# Every INDEX_STRIDE-th timestamp is kept in the in-memory index used to narrow range queries
+INDEX_STRIDE = 4096
+
+def _column_path(directory, column):
+    return os.path.join(directory, f"{column}.bin")
+
+def _to_nanoseconds(values):
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values)
+    return np.asarray(values.values.astype('datetime64[ns]').astype('int64'))
+
+def write_store(df, directory, time_column='timestamp', datetime_columns=None):
+    """
+    Write a DataFrame sorted by time as a binary store of contiguous columns.
+
+    Datetime columns are written as raw int64 nanoseconds and the other columns as raw
+    float64, one file per column, together with a sparse time index and a small JSON
+    description. The store can be opened with SpreadStore without reading the data.
+
+    Parameters:
+    - df: DataFrame to write, e.g. a spread file (timestamp, spread) or a signal
+          durations file (Start, End, Duration).
+    - directory: Directory of the store.
+    - time_column: Column the store is sorted and queried by.
+    - datetime_columns: Other datetime columns to store as int64 nanoseconds.
+    """
+    os.makedirs(directory, exist_ok=True)
+    datetime_columns = [time_column] + [column for column in (datetime_columns or []) if column != time_column]
+
+    timestamps = _to_nanoseconds(df[time_column])
+    order = None
+    if len(timestamps) and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+
+    columns = {}
+    for column in df.columns:
+        if column in datetime_columns:
+            values = _to_nanoseconds(df[column])
+            dtype = 'int64'
+        else:
+            values = df[column].values.astype('float64')
+            dtype = 'float64'
+        if order is not None:
+            values = values[order]
+        values.astype(dtype).tofile(_column_path(directory, column))
+        columns[column] = dtype
+
+    timestamps = timestamps if order is None else timestamps[order]
+    np.save(os.path.join(directory, 'index.npy'), timestamps[::INDEX_STRIDE])
+
+    with open(os.path.join(directory, 'store.json'), 'w') as f:
+        json.dump({'rows': len(timestamps), 'time_column': time_column, 'columns': columns,
+                   'datetime_columns': datetime_columns, 'index_stride': INDEX_STRIDE}, f, indent=2)
+    print(f"Store saved: {directory}")
+    return directory
+
+def csv_to_store(input_file, directory, time_column='timestamp', datetime_columns=None, chunksize=5_000_000):
+    """
+    Convert a spread or signal CSV file to a binary store, chunk by chunk.
+    """
+    os.makedirs(directory, exist_ok=True)
+    datetime_columns = [time_column] + [column for column in (datetime_columns or []) if column != time_column]
+
+    columns = None
+    rows = 0
+    sparse_index = []
+    last_timestamp = None
+    files = {}
+    try:
+        for chunk in pd.read_csv(input_file, chunksize=chunksize):
+            if columns is None:
+                columns = {column: ('int64' if column in datetime_columns else 'float64') for column in chunk.columns}
+                files = {column: open(_column_path(directory, column), 'wb') for column in columns}
+            timestamps = _to_nanoseconds(chunk[time_column])
+            if len(timestamps) and ((last_timestamp is not None and timestamps[0] < last_timestamp) or np.any(np.diff(timestamps) < 0)):
+                raise ValueError(f"{input_file} is not sorted by {time_column}; load it and use write_store instead")
+            if len(timestamps):
+                last_timestamp = timestamps[-1]
+
+            # Keep every INDEX_STRIDE-th timestamp of the whole file, not of the chunk
+            first = (-rows) % INDEX_STRIDE
+            sparse_index.append(timestamps[first::INDEX_STRIDE])
+            rows += len(timestamps)
+
+            for column, dtype in columns.items():
+                values = _to_nanoseconds(chunk[column]) if dtype == 'int64' else chunk[column].values.astype('float64')
+                files[column].write(values.astype(dtype).tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    np.save(os.path.join(directory, 'index.npy'), np.concatenate(sparse_index) if sparse_index else np.empty(0, dtype='int64'))
+    with open(os.path.join(directory, 'store.json'), 'w') as f:
+        json.dump({'rows': rows, 'time_column': time_column, 'columns': columns or {},
+                   'datetime_columns': datetime_columns, 'index_stride': INDEX_STRIDE}, f, indent=2)
+    print(f"Store saved: {directory}")
+    return directory
+
+class SpreadStore:
+    """
+    Read-only view of a binary store written by write_store or csv_to_store.
+
+    Columns are opened with np.memmap, so opening a store costs the same no matter how
+    large it is, and a time range query only touches the pages of the matching rows.
+
+    Parameters:
+    - directory: Directory of the store.
+    """
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'store.json')) as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.rows = self.meta['rows']
+        self.time_column = self.meta['time_column']
+        self.index = np.load(os.path.join(directory, 'index.npy'))
+        self.index_stride = self.meta['index_stride']
+        self.columns = {}
+        for column, dtype in self.meta['columns'].items():
+            if self.rows:
+                self.columns[column] = np.memmap(_column_path(directory, column), dtype=dtype, mode='r', shape=(self.rows,))
+            else:
+                self.columns[column] = np.empty(0, dtype=dtype)
+
+    def __len__(self):
+        return self.rows
+
+    def _search(self, timestamp, side):
+        # Narrow the search to one block with the in-memory index, then search inside the block
+        block = np.searchsorted(self.index, timestamp, side=side)
+        low = max(block - 1, 0) * self.index_stride
+        high = min(block * self.index_stride + 1, self.rows)
+        return low + int(np.searchsorted(self.columns[self.time_column][low:high], timestamp, side=side))
+
+    def slice(self, start=None, end=None):
+        """
+        Row positions [first, last) of the rows with start <= time <= end.
+        """
+        first = 0 if start is None else self._search(pd.Timestamp(start).as_unit('ns').value, 'left')
+        last = self.rows if end is None else self._search(pd.Timestamp(end).as_unit('ns').value, 'right')
+        return first, max(first, last)
+
+    def query(self, start=None, end=None, columns=None):
+        """
+        Zero-copy arrays of the rows with start <= time <= end.
+
+        Parameters:
+        - start: Optional inclusive start of the time range.
+        - end: Optional inclusive end of the time range.
+        - columns: Columns to return, all by default.
+
+        Returns:
+        - A dictionary of column name to memory-mapped array slice. Datetime columns are
+          int64 nanoseconds; view them with .view('datetime64[ns]') to get datetimes.
+        """
+        first, last = self.slice(start, end)
+        return {column: self.columns[column][first:last] for column in (columns or self.columns)}
+
+    def to_frame(self, start=None, end=None, columns=None):
+        """
+        Copy the rows with start <= time <= end into a DataFrame with datetime columns.
+        """
+        data = self.query(start, end, columns)
+        return pd.DataFrame({column: (np.asarray(values).view('datetime64[ns]') if column in self.meta['datetime_columns'] else np.asarray(values))
+                             for column, values in data.items()})
+
+def is_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'store.json'))
@@ -0,0 +1,317 @@
+import math
+import pandas as pd
+import numpy as np
+import parallel
+
+class Moments:
+    """
+    Count, mean, variance, min and max of a stream of values.
+
+    Each batch is summarized with array operations and folded into the running state with
+    Chan's parallel update, the same rule merge uses to combine two partial results.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = values.mean()
+            self._combine(len(values), mean, float(np.sum((values - mean) ** 2)), float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def std(self, ddof=0):
+        return math.sqrt(self.m2 / (self.count - ddof)) if self.count > ddof else math.nan
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative error guarantee, after DDSketch.
+
+    Values are counted in logarithmic buckets of width gamma = (1 + a) / (1 - a), so any
+    quantile is returned within a relative error a of the exact one, whatever the number of
+    values. Negative values use a mirrored set of buckets, and values closer to zero than
+    min_value are counted as zero.
+
+    Parameters:
+    - relative_accuracy: The relative error a.
+    - min_value: Smallest magnitude told apart from zero.
+    """
+    def __init__(self, relative_accuracy=0.01, min_value=1e-12):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype('int64'), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values > self.min_value
+        negative = values < -self.min_value
+        self._add(self.positive, values[positive])
+        self._add(self.negative, -values[negative])
+        self.zero_count += int(len(values) - positive.sum() - negative.sum())
+        self.count += len(values)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError(f"Cannot merge sketches of relative accuracy {other.relative_accuracy} and {self.relative_accuracy}")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Estimate of the q-quantile (0 <= q <= 1), or NaN if the sketch is empty.
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+class ValueCounts:
+    """
+    Exact count of every distinct value, for discrete streams such as signal durations
+    (whole seconds, or 0.5 under one second). Any histogram or quantile can be derived
+    from it after the fact.
+    """
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        keys, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def arrays(self):
+        values = np.array(sorted(self.counts), dtype=float)
+        return values, np.array([self.counts[value] for value in values.tolist()], dtype='int64')
+
+    def count_where(self, condition):
+        values, counts = self.arrays()
+        return int(counts[condition(values)].sum())
+
+    def median(self):
+        values, counts = self.arrays()
+        total = counts.sum()
+        if total == 0:
+            return math.nan
+        cumulative = np.cumsum(counts)
+        # Average of the two middle values for an even count, like np.median
+        low = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+        high = values[np.searchsorted(cumulative, total // 2, side='right')]
+        return (low + high) / 2
+
+    def histogram(self, bins):
+        """
+        Histogram of the values over the given bin edges, in the format of reporting.histogram.
+        """
+        values, counts = self.arrays()
+        counts, edges = np.histogram(values, bins=bins, weights=counts)
+        return {'counts': counts.astype('int64'), 'edges': edges}
+
+class TimeBucketCounts:
+    """
+    Number of events per time bucket (e.g. signals per day).
+
+    Parameters:
+    - bucket: Bucket length, e.g. '1D' or '1h'.
+    """
+    def __init__(self, bucket='1D'):
+        self.bucket = bucket
+        self.bucket_ns = pd.Timedelta(bucket).value
+        self.counts = {}
+
+    def update(self, timestamps):
+        times = np.asarray(timestamps).astype('datetime64[ns]')
+        times = times[~np.isnat(times)].astype('int64')
+        keys, counts = np.unique(times // self.bucket_ns, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, other):
+        if other.bucket_ns != self.bucket_ns:
+            raise ValueError(f"Cannot merge counts per {other.bucket} and per {self.bucket}")
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def to_series(self):
+        keys = sorted(self.counts)
+        index = pd.to_datetime(np.array(keys, dtype='int64') * self.bucket_ns)
+        return pd.Series([self.counts[key] for key in keys], index=index, name='count', dtype='int64')
+
+class StatisticsAccumulator:
+    """
+    Single-pass, mergeable statistics of spread and signal streams.
+
+    Spreads feed running moments and a quantile sketch. Signal durations feed exact value
+    counts, which give the metrics of calculate_trade_durations_statistics and any duration
+    histogram. Signal starts feed counts per time bucket for the signal density. Data is
+    consumed in chunks and never kept, and two accumulators built on different partitions
+    (months, workers) combine with merge into the statistics of the whole.
+
+    Parameters:
+    - density_bucket: Time bucket of the signal density, e.g. '1D'.
+    - relative_accuracy: Relative error of the spread quantiles.
+    """
+    def __init__(self, density_bucket='1D', relative_accuracy=0.01):
+        self.spread_moments = Moments()
+        self.spread_sketch = QuantileSketch(relative_accuracy)
+        self.duration_moments = Moments()
+        self.durations = ValueCounts()
+        self.density = TimeBucketCounts(density_bucket)
+
+    def add_spreads(self, spreads):
+        self.spread_moments.update(spreads)
+        self.spread_sketch.update(spreads)
+
+    def add_signals(self, starts, durations):
+        self.duration_moments.update(durations)
+        self.durations.update(durations)
+        self.density.update(starts)
+
+    def merge(self, other):
+        self.spread_moments.merge(other.spread_moments)
+        self.spread_sketch.merge(other.spread_sketch)
+        self.duration_moments.merge(other.duration_moments)
+        self.durations.merge(other.durations)
+        self.density.merge(other.density)
+        return self
+
+    def spread_statistics(self, quantiles=(0.01, 0.05, 0.25, 0.75, 0.95, 0.99)):
+        """
+        The statistics of data_visualization.calculate_spread_statistics, with the median
+        and the other quantiles estimated by the sketch.
+        """
+        moments = self.spread_moments
+        stats = {
+            'mean_spread': moments.mean if moments.count else math.nan,
+            'median_spread': self.spread_sketch.quantile(0.5),
+            'std_spread': moments.std(),
+            'min_spread': moments.min if moments.count else math.nan,
+            'max_spread': moments.max if moments.count else math.nan,
+            'total_count': moments.count,
+        }
+        stats.update({f"q{q:g}_spread": self.spread_sketch.quantile(q) for q in quantiles})
+        return stats
+
+    def duration_statistics(self, rolling_mean_window=None, threshold=None):
+        """
+        The metrics of trading_signal_analysis.calculate_trade_durations_statistics.
+        """
+        moments = self.duration_moments
+        return {
+            'Rolling Mean Window': rolling_mean_window,
+            'Spread Threshold': threshold,
+            'Trade Count': moments.count,
+            'Mean Duration (seconds)': moments.mean if moments.count else math.nan,
+            'Median Duration (seconds)': self.durations.median(),
+            'Standard Deviation': moments.std(),
+            'Max Duration (seconds)': moments.max if moments.count else math.nan,
+            'Min Duration (seconds)': moments.min if moments.count else math.nan,
+            'Trades whithin 1 sec': self.durations.count_where(lambda values: values == 0.5),
+            'Trades in 1 sec': self.durations.count_where(lambda values: values == 1),
+            'Trades in 2-5 secs': self.durations.count_where(lambda values: (values >= 2) & (values <= 5)),
+            'Trades within 10 secs': self.durations.count_where(lambda values: values <= 10),
+        }
+
+    def duration_histogram(self, bins=(0, 1, 2, 5, 10, 30, 60, np.inf)):
+        """
+        Signal durations over configurable bin edges, in the format of reporting.histogram.
+        """
+        return self.durations.histogram(np.asarray(bins, dtype=float))
+
+    def signal_density(self):
+        """
+        Number of signals per density bucket, as a Series indexed by bucket start.
+        """
+        return self.density.to_series()
+
+def accumulate(spread_file=None, signal_file=None, chunksize=1_000_000, density_bucket='1D', relative_accuracy=0.01):
+    """
+    Build a StatisticsAccumulator from a spread CSV file and/or a signal durations CSV file,
+    reading them chunk by chunk.
+    """
+    accumulator = StatisticsAccumulator(density_bucket, relative_accuracy)
+    if spread_file is not None:
+        for chunk in pd.read_csv(spread_file, usecols=['spread'], chunksize=chunksize):
+            accumulator.add_spreads(chunk['spread'].values)
+    if signal_file is not None:
+        for chunk in pd.read_csv(signal_file, usecols=['Start', 'Duration'], chunksize=chunksize):
+            accumulator.add_signals(pd.to_datetime(chunk['Start']).values, chunk['Duration'].values)
+    return accumulator
+
+def accumulate_partitions(spread_files=(), signal_files=(), max_workers=None, chunksize=1_000_000, density_bucket='1D', relative_accuracy=0.01):
+    """
+    Accumulate many partition files (e.g. one per month) in parallel processes and merge
+    the partial results.
+
+    Parameters:
+    - spread_files: Spread CSV files.
+    - signal_files: Signal durations CSV files.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 reads the files in the current process.
+
+    Returns:
+    - The merged StatisticsAccumulator.
+    """
+    options = (chunksize, density_bucket, relative_accuracy)
+    tasks = [(spread_file, None) + options for spread_file in spread_files] + [(None, signal_file) + options for signal_file in signal_files]
+    partials = parallel.run_tasks(accumulate, tasks, max_workers)
+
+    accumulator = StatisticsAccumulator(density_bucket, relative_accuracy)
+    for partial in partials:
+        accumulator.merge(partial)
+    return accumulator
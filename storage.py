@@ -0,0 +1,164 @@
+import os
+import glob
+import pandas as pd
+
+# Columnar formats supported by the storage layer; CSV stays available through export_csv
+STORAGE_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+def _check_format(storage_format):
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format '{storage_format}', expected one of {sorted(STORAGE_FORMATS)}")
+
+def _to_nanoseconds(values):
+    # int64 nanoseconds since epoch, so that reading back needs no datetime parsing
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values)
+    return values.values.astype('datetime64[ns]').astype('int64')
+
+def _to_timestamp_bound(value):
+    return None if value is None else pd.Timestamp(value).as_unit('ns').value
+
+def partition_directory(root, pair, year, month):
+    """
+    Directory holding one month of a dataset: <root>/pair=<pair>/year=<YYYY>/month=<MM>.
+    """
+    return os.path.join(root, f"pair={pair}", f"year={year}", f"month={month:02d}")
+
+def list_partitions(root, pair):
+    """
+    List the (year, month) partitions stored for a dataset, in chronological order.
+    """
+    partitions = []
+    for directory in glob.glob(os.path.join(root, f"pair={pair}", "year=*", "month=*")):
+        year = int(os.path.basename(os.path.dirname(directory)).split('=')[1])
+        month = int(os.path.basename(directory).split('=')[1])
+        partitions.append((year, month))
+    return sorted(partitions)
+
+def write_frame(df, root, pair, storage_format='parquet', time_column='timestamp', datetime_columns=None, append=False):
+    """
+    Write a DataFrame to a columnar dataset partitioned by pair/year/month.
+
+    Datetime columns are stored as int64 nanoseconds since epoch.
+
+    Parameters:
+    - df: DataFrame to write.
+    - root: Root directory of the storage layer.
+    - pair: Dataset name, e.g. 'SOLUSDT-SOLUSDT' or 'spreads_SOLUSDT_SOLUSDT'.
+    - storage_format: 'parquet' or 'feather'.
+    - time_column: Column the year/month partitions and range queries are based on.
+    - datetime_columns: Other datetime columns to store as int64 nanoseconds.
+    - append: Add a new part file to existing partitions instead of replacing them.
+
+    Returns:
+    - A list of the files written.
+    """
+    _check_format(storage_format)
+    df = df.copy()
+    for column in [time_column] + list(datetime_columns or []):
+        df[column] = _to_nanoseconds(df[column])
+
+    timestamps = df[time_column].values.astype('datetime64[ns]')
+    years = timestamps.astype('datetime64[Y]').astype(int) + 1970
+    months = timestamps.astype('datetime64[M]').astype(int) % 12 + 1
+
+    written = []
+    for (year, month), part_df in df.groupby([years, months], sort=True):
+        directory = partition_directory(root, pair, year, month)
+        os.makedirs(directory, exist_ok=True)
+        existing = sorted(glob.glob(os.path.join(directory, f"part-*{STORAGE_FORMATS[storage_format]}")))
+        if not append:
+            for filepath in existing:
+                os.remove(filepath)
+            existing = []
+        filepath = os.path.join(directory, f"part-{len(existing):05d}{STORAGE_FORMATS[storage_format]}")
+
+        part_df = part_df.reset_index(drop=True)
+        if storage_format == 'parquet':
+            part_df.to_parquet(filepath, index=False)
+        else:
+            part_df.to_feather(filepath)
+        written.append(filepath)
+    return written
+
+def read_frame(root, pair, columns=None, start=None, end=None, storage_format='parquet', time_column='timestamp', datetime_columns=None):
+    """
+    Read a dataset written by write_frame, loading only the requested columns and time range.
+
+    Only the monthly partitions overlapping [start, end] are opened, and rows are filtered
+    on the int64 time column while reading.
+
+    Parameters:
+    - root: Root directory of the storage layer.
+    - pair: Dataset name used when writing.
+    - columns: Columns to load. The time column is always loaded.
+    - start: Optional inclusive start of the time range.
+    - end: Optional inclusive end of the time range.
+    - storage_format: 'parquet' or 'feather'.
+    - time_column: Column the partitions and range queries are based on.
+    - datetime_columns: Other int64 nanosecond columns to convert back to datetimes.
+
+    Returns:
+    - A DataFrame with datetime64[ns] time columns, sorted as written.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    _check_format(storage_format)
+    if columns is not None and time_column not in columns:
+        columns = [time_column] + list(columns)
+    start_ns, end_ns = _to_timestamp_bound(start), _to_timestamp_bound(end)
+    start_month = None if start is None else (pd.Timestamp(start).year, pd.Timestamp(start).month)
+    end_month = None if end is None else (pd.Timestamp(end).year, pd.Timestamp(end).month)
+
+    filters = []
+    if start_ns is not None:
+        filters.append((time_column, '>=', start_ns))
+    if end_ns is not None:
+        filters.append((time_column, '<=', end_ns))
+
+    tables = []
+    for year, month in list_partitions(root, pair):
+        if (start_month and (year, month) < start_month) or (end_month and (year, month) > end_month):
+            continue
+        directory = partition_directory(root, pair, year, month)
+        for filepath in sorted(glob.glob(os.path.join(directory, f"part-*{STORAGE_FORMATS[storage_format]}"))):
+            if storage_format == 'parquet':
+                table = pq.read_table(filepath, columns=columns, filters=filters or None)
+            else:
+                table = feather.read_table(filepath, columns=columns)
+                if start_ns is not None:
+                    table = table.filter(pc.greater_equal(table[time_column], start_ns))
+                if end_ns is not None:
+                    table = table.filter(pc.less_equal(table[time_column], end_ns))
+            tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=columns or [time_column])
+    df = pa.concat_tables(tables).to_pandas()
+    for column in [time_column] + list(datetime_columns or []):
+        if column in df.columns:
+            df[column] = df[column].values.astype('datetime64[ns]')
+    return df
+
+def read_partition(root, pair, year, month, columns=None, storage_format='parquet', time_column='timestamp', datetime_columns=None):
+    """
+    Read a single monthly partition of a dataset.
+    """
+    start = pd.Timestamp(year=year, month=month, day=1)
+    end = start + pd.offsets.MonthBegin(1) - pd.Timedelta(1, 'ns')
+    return read_frame(root, pair, columns=columns, start=start, end=end, storage_format=storage_format,
+                      time_column=time_column, datetime_columns=datetime_columns)
+
+def export_csv(root, pair, output_path, columns=None, start=None, end=None, storage_format='parquet', time_column='timestamp', datetime_columns=None):
+    """
+    Export a dataset (or a column/time slice of it) to CSV, formatted like the CSV files
+    the pipeline used to write.
+    """
+    df = read_frame(root, pair, columns=columns, start=start, end=end, storage_format=storage_format,
+                    time_column=time_column, datetime_columns=datetime_columns)
+    df.to_csv(output_path, index=False)
+    print(f"CSV file saved: {output_path}")
+    return output_path
@@ -0,0 +1,231 @@
+import asyncio
+import time
+import pandas as pd
+import numpy as np
+import rolling_statistics
+import holding_position_analysis
+
+class StreamingSignal:
+    """
+    Trading signal and long/short position state updated one tick at a time.
+
+    Every update costs O(1) whatever the window length: the rolling mean of the signal
+    backtest (RollingMean, the mean of the last mean_n spreads including the current one)
+    and the trailing mean of the holding backtest (TrailingMean, the mean of the previous
+    mean_n spreads) are both kept incrementally with the same arithmetic as the batch
+    functions, and the decisions follow detect_signals and detect_position_flips, so a
+    replay of the history gives exactly the signals and flips of the batch backtests.
+
+    The batch backtests do not run through this class: they compute their means for all
+    rows at once (pandas' rolling mean and rolling_statistics.trailing_mean), which is far
+    faster than a Python call per row. The two paths share the decision functions only, and
+    their parity is pinned by tests/test_streaming_signals.py.
+
+    Only row-count windows are supported. A duration window ('15min') would need a mean over
+    a variable number of rows; the batch functions give those with
+    rolling_statistics.time_rolling_mean and time_trailing_mean.
+
+    Parameters:
+    - mean_n: Number of rows in the rolling mean window.
+    - threshold: Spread threshold around the rolling mean.
+    - position_warm_up: Number of rows before positions may be taken, as in the holding backtest.
+
+    update returns a (usually empty) list of events, each a dictionary with an 'event' key:
+    - 'signal_start': timestamp, spread, side ('above' or 'below' the bounds)
+    - 'signal_end': start, end, duration (seconds, 0.5 when under one second)
+    - 'exit': timestamp, position closed (1 long, -1 short)
+    - 'entry': timestamp, position opened
+    Timestamps are int64 nanoseconds.
+    """
+    def __init__(self, mean_n, threshold, position_warm_up=holding_position_analysis.WARM_UP_ROWS):
+        if rolling_statistics.is_time_window(mean_n):
+            raise ValueError(f"StreamingSignal needs mean_n as a number of rows, not the duration {mean_n!r}; "
+                             "use the batch backtests for time windows")
+        self.mean_n = mean_n
+        self.threshold = threshold
+        self.position_warm_up = position_warm_up
+        self.rolling_mean = rolling_statistics.RollingMean(mean_n)
+        self.trailing_mean = rolling_statistics.TrailingMean(mean_n)
+        self.rows = 0
+        self.last_timestamp = None
+        self.signal_start = None  # timestamp of the open signal, if any
+        self.position = 0
+        self.position_entry = None  # timestamp the current position was entered
+
+    def update(self, timestamp, spot_price, future_price):
+        """
+        Process one merged tick. The spread is (future - spot) / spot, as in data_cleaning.
+        """
+        return self.update_spread(timestamp, (future_price - spot_price) / spot_price)
+
+    def update_spread(self, timestamp, spread):
+        """
+        Process one spread value.
+
+        Parameters:
+        - timestamp: int nanoseconds, np.datetime64 or pd.Timestamp.
+        - spread: Spread of the tick.
+
+        Returns:
+        - The list of events triggered by the tick.
+        """
+        if not isinstance(timestamp, int):
+            timestamp = pd.Timestamp(timestamp).as_unit('ns').value
+        spread = float(spread)
+        index = self.rows
+        self.rows += 1
+        self.last_timestamp = timestamp
+        events = []
+
+        # Signal state, as in detect_signals with first_index = mean_n - 1
+        mean = self.rolling_mean.push(spread)
+        if index >= self.mean_n - 1:
+            upper_bound = mean + self.threshold
+            lower_bound = mean - self.threshold
+            above = spread > upper_bound
+            below = spread < lower_bound
+            if self.signal_start is not None and (above or below or (spread <= upper_bound and spread >= lower_bound)):
+                seconds = (timestamp - self.signal_start) // 10**9
+                events.append({'event': 'signal_end', 'start': self.signal_start, 'end': timestamp,
+                               'duration': 0.5 if seconds < 1 else float(seconds)})
+                self.signal_start = None
+            if above or below:
+                self.signal_start = timestamp
+                events.append({'event': 'signal_start', 'timestamp': timestamp, 'spread': spread, 'side': 'above' if above else 'below'})
+
+        # Position state, as in detect_position_flips
+        mean_min = self.trailing_mean.push(spread)
+        if index >= self.position_warm_up:
+            if spread > self.threshold + mean_min:
+                side = -1
+            elif spread < -self.threshold + mean_min:
+                side = 1
+            else:
+                side = 0
+            if side and side != self.position:
+                if self.position:
+                    events.append({'event': 'exit', 'timestamp': timestamp, 'position': self.position})
+                events.append({'event': 'entry', 'timestamp': timestamp, 'position': side})
+                self.position = side
+                self.position_entry = timestamp
+        return events
+
+    def open_signal(self):
+        """
+        The signal still open after the last tick as a (start, end, duration) row, like the
+        last row detect_signals writes for it, or None.
+        """
+        if self.signal_start is None:
+            return None
+        seconds = (self.last_timestamp - self.signal_start) // 10**9
+        return self.signal_start, self.last_timestamp, max(seconds, 1)
+
+def replay_frame(merged_data, mean_n, threshold, position_warm_up=holding_position_analysis.WARM_UP_ROWS):
+    """
+    Feed a spread DataFrame through StreamingSignal row by row and collect what it emits.
+
+    This is the live code path run over history, meant to check it against the batch
+    backtests; those stay the fast way to backtest.
+
+    Returns:
+    - A tuple of (signals_df, entries_df): the Start/End/Duration table of
+      modified_optimized_backtest_arbitrage_strategy and the timestamp/position of every
+      entry of the holding backtest.
+    """
+    signal = StreamingSignal(mean_n, threshold, position_warm_up)
+    timestamps = pd.to_datetime(merged_data['timestamp']).values.astype('datetime64[ns]').astype('int64').tolist()
+    spreads = merged_data['spread'].values.astype(float).tolist()
+
+    signal_rows, entries = [], []
+    for timestamp, spread in zip(timestamps, spreads):
+        for event in signal.update_spread(timestamp, spread):
+            if event['event'] == 'signal_end':
+                signal_rows.append((event['start'], event['end'], event['duration']))
+            elif event['event'] == 'entry':
+                entries.append((event['timestamp'], event['position']))
+
+    # Durations are floats once a signal has closed, the open signal's duration an int, as in detect_signals
+    durations = np.array([row[2] for row in signal_rows], dtype=float) if signal_rows else np.empty(0, dtype=int)
+    open_signal = signal.open_signal()
+    if open_signal is not None:
+        signal_rows.append(open_signal)
+        durations = np.append(durations, open_signal[2])
+    signals_df = pd.DataFrame({'Start': np.array([row[0] for row in signal_rows], dtype='int64').view('datetime64[ns]'),
+                               'End': np.array([row[1] for row in signal_rows], dtype='int64').view('datetime64[ns]'),
+                               'Duration': durations})
+    entries_df = pd.DataFrame({'timestamp': np.array([entry[0] for entry in entries], dtype='int64').view('datetime64[ns]'),
+                               'position': np.array([entry[1] for entry in entries], dtype=int)})
+    return signals_df, entries_df
+
+async def produce_ticks(csv_files, queue, speed=None, chunksize=100_000):
+    """
+    Replay merged CSV files into an asyncio queue as (timestamp, spot_price, future_price) ticks,
+    followed by None once every file is read.
+
+    Parameters:
+    - csv_files: Merged files in chronological order.
+    - queue: asyncio.Queue the ticks are put on.
+    - speed: None replays as fast as the consumer keeps up; otherwise ticks are paced by
+             their timestamps, sped up by this factor (1.0 is real time).
+    - chunksize: Number of rows read at a time.
+    """
+    columns = ['timestamp', 'weighted_avg_price_spot', 'weighted_avg_price_future']
+    first_timestamp = start = None
+    for csv_file in csv_files:
+        for chunk in pd.read_csv(csv_file, usecols=columns, chunksize=chunksize):
+            timestamps = pd.to_datetime(chunk['timestamp']).values.astype('datetime64[ns]').astype('int64').tolist()
+            ticks = zip(timestamps, chunk['weighted_avg_price_spot'].values.tolist(), chunk['weighted_avg_price_future'].values.tolist())
+            for tick in ticks:
+                if speed is not None:
+                    if first_timestamp is None:
+                        first_timestamp, start = tick[0], time.perf_counter()
+                    delay = (tick[0] - first_timestamp) / 10**9 / speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await queue.put(tick)
+    await queue.put(None)
+
+async def consume_ticks(queue, signal, on_event=None):
+    """
+    Update a StreamingSignal with every tick of the queue until None arrives.
+
+    Parameters:
+    - queue: asyncio.Queue filled by produce_ticks (or a live feed).
+    - signal: StreamingSignal to update.
+    - on_event: Optional callable, or coroutine function, called with every event. Each
+                event carries the 'latency' in seconds between taking the tick off the
+                queue and emitting the event.
+
+    Returns:
+    - The number of ticks processed.
+    """
+    ticks = 0
+    while True:
+        tick = await queue.get()
+        if tick is None:
+            return ticks
+        received = time.perf_counter()
+        events = signal.update(*tick)
+        ticks += 1
+        if events and on_event is not None:
+            latency = time.perf_counter() - received
+            for event in events:
+                event['latency'] = latency
+                result = on_event(event)
+                if asyncio.iscoroutine(result):
+                    await result
+
+async def replay(csv_files, mean_n, threshold, on_event=None, speed=None, position_warm_up=holding_position_analysis.WARM_UP_ROWS):
+    """
+    Run a StreamingSignal as an asyncio consumer against a local replay of merged CSV files.
+
+    Usage: asyncio.run(replay(data_cleaning.merged_files_in_order(merged_directory, spot, future), mean_n, threshold, print))
+
+    Returns:
+    - The StreamingSignal after the last tick.
+    """
+    signal = StreamingSignal(mean_n, threshold, position_warm_up)
+    # A bounded queue keeps the reader at most a few thousand ticks ahead of the consumer
+    queue = asyncio.Queue(maxsize=10_000)
+    await asyncio.gather(produce_ticks(csv_files, queue, speed), consume_ticks(queue, signal, on_event))
+    return signal
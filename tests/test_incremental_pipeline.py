@@ -0,0 +1,124 @@
+import os
+import filecmp
+import numpy as np
+import pandas as pd
+import pytest
+import benchmark
+import data_cleaning
+import data_merging
+import holding_position_analysis
+import incremental_pipeline
+import trading_signal_analysis
+
+def write_merged_month(directory, start, periods, freq, seed):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=periods, freq=freq)
+    spot = 20 + np.cumsum(rng.normal(0, 0.01, periods))
+    future = spot * (1 + rng.normal(0, 1e-3, periods))
+    spot[rng.random(periods) < 0.01] = np.nan
+    pd.DataFrame({'timestamp': timestamps, 'weighted_avg_price_spot': spot, 'weighted_avg_price_future': future}).to_csv(
+        os.path.join(directory, f"SPOT-FUT-{timestamps[0]:%Y-%m}.csv"), index=False)
+
+# Whole-second months, then a sub-second one that changes the format of the history
+MONTHS = [('2023-01-31 22:00', 4000, '1s'), ('2023-02-01', 3000, '1s'), ('2023-03-01', 3000, '2s'), ('2023-04-01', 5000, '300ms')]
+
+def full_run(tmp_path, mean_n, threshold):
+    full = tmp_path / 'full'
+    full.mkdir()
+    data_cleaning.calculate_spread(str(tmp_path / 'merged'), 'SPOT', 'FUT', str(full), streaming=False)
+    spreads = pd.read_csv(full / 'spreads_SPOT_FUT.csv')
+    trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+        mean_n, spreads, threshold, 'window', str(full), show_plot=False, cache=False)
+    return full
+
+@pytest.mark.parametrize('mean_n, threshold', [(30, 0.0012), (500, 0.002)])
+def test_incremental_runs_match_a_full_rerun(tmp_path, mean_n, threshold):
+    merged, incremental, checkpoints = tmp_path / 'merged', tmp_path / 'incremental', tmp_path / 'checkpoints'
+    merged.mkdir()
+    incremental.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    for seed, month in enumerate(MONTHS):
+        write_merged_month(merged, *month, seed)
+        incremental_pipeline.append_new_spreads(str(merged), 'SPOT', 'FUT', str(incremental), manifest_path)
+        metrics = incremental_pipeline.run_signal_backtest_incremental(
+            str(incremental / 'spreads_SPOT_FUT.csv'), mean_n, threshold, 'window', str(incremental), str(checkpoints))
+
+    full = full_run(tmp_path, mean_n, threshold)
+    assert (incremental / 'spreads_SPOT_FUT.csv').read_bytes() == (full / 'spreads_SPOT_FUT.csv').read_bytes()
+    assert (incremental / 'signal_durations_window.csv').read_bytes() == (full / 'signal_durations_window.csv').read_bytes()
+    assert metrics['Trade Count'] == len(pd.read_csv(full / 'signal_durations_window.csv'))
+
+def test_interrupted_checkpoint_resumes_from_the_previous_one(tmp_path, monkeypatch):
+    merged, incremental, checkpoints = tmp_path / 'merged', tmp_path / 'incremental', tmp_path / 'checkpoints'
+    merged.mkdir()
+    incremental.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+    spread_file = str(incremental / 'spreads_SPOT_FUT.csv')
+
+    def run():
+        incremental_pipeline.run_signal_backtest_incremental(spread_file, 30, 0.0012, 'window', str(incremental), str(checkpoints))
+
+    write_merged_month(merged, *MONTHS[0], 0)
+    incremental_pipeline.append_new_spreads(str(merged), 'SPOT', 'FUT', str(incremental), manifest_path)
+    run()
+
+    # The next run dies after writing the signals and the window, before its state is saved
+    write_merged_month(merged, *MONTHS[3], 3)
+    incremental_pipeline.append_new_spreads(str(merged), 'SPOT', 'FUT', str(incremental), manifest_path)
+    write_json = incremental_pipeline._write_json
+    def crash(data, path):
+        if path.endswith('.json') and os.path.dirname(path) == str(checkpoints):
+            raise KeyboardInterrupt
+        write_json(data, path)
+    monkeypatch.setattr(incremental_pipeline, '_write_json', crash)
+    with pytest.raises(KeyboardInterrupt):
+        run()
+    monkeypatch.setattr(incremental_pipeline, '_write_json', write_json)
+    run()
+
+    full = full_run(tmp_path, 30, 0.0012)
+    assert (incremental / 'signal_durations_window.csv').read_bytes() == (full / 'signal_durations_window.csv').read_bytes()
+
+@pytest.mark.parametrize('mean_n, threshold', [(30, 0.0012), (6000, 0.0005)])
+def test_incremental_holding_runs_match_a_full_rerun(tmp_path, monkeypatch, mean_n, threshold):
+    # A short warm-up lets positions open inside the first month, where a 6000-row window still wraps around
+    monkeypatch.setattr(holding_position_analysis, 'WARM_UP_ROWS', 1000)
+    merged, incremental, checkpoints = tmp_path / 'merged', tmp_path / 'incremental', tmp_path / 'checkpoints'
+    merged.mkdir()
+    incremental.mkdir()
+    manifest_path = str(tmp_path / 'manifest.json')
+    spread_file = incremental / 'spreads_SPOT_FUT.csv'
+
+    for seed, month in enumerate(MONTHS):
+        write_merged_month(merged, *month, seed)
+        incremental_pipeline.append_new_spreads(str(merged), 'SPOT', 'FUT', str(incremental), manifest_path)
+        metrics = incremental_pipeline.run_holding_backtest_incremental(str(spread_file), mean_n, threshold, 'window', str(checkpoints))
+        expected = holding_position_analysis.backtest_arbitrage_strategy_hedging_ratio_version_rolling(
+            mean_n, pd.read_csv(spread_file), threshold, 'window', show_plot=False)
+        assert metrics == expected
+    assert metrics['Trade Count'] > 0
+
+def test_time_windows_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match='number of rows'):
+        incremental_pipeline.run_signal_backtest_incremental('spreads.csv', '15min', 0.001, 'window', str(tmp_path), str(tmp_path))
+    with pytest.raises(ValueError, match='number of rows'):
+        incremental_pipeline.run_holding_backtest_incremental('spreads.csv', '15min', 0.001, 'window', str(tmp_path))
+
+def test_merge_new_months_matches_a_full_merge(tmp_path):
+    spot_df, future_df = benchmark.generate_prices('2D', '1s', '2023-03-31')
+    benchmark.write_processed_files(spot_df, future_df, str(tmp_path / 'spot'), str(tmp_path / 'future'))
+    manifest_path = str(tmp_path / 'manifest.json')
+    merged = incremental_pipeline.merge_new_months(str(tmp_path / 'spot'), str(tmp_path / 'future'), 'BENCHUSDT', 'BENCHUSDT',
+                                                   str(tmp_path / 'incremental'), manifest_path)
+    assert merged == ['2023-03', '2023-04']
+
+    (tmp_path / 'full').mkdir()
+    data_merging.read_and_merge_csv_files(str(tmp_path / 'spot'), str(tmp_path / 'future'), ['BENCHUSDT'], ['BENCHUSDT'], [2023], [3, 4],
+                                          str(tmp_path / 'full'))
+    for filename in os.listdir(tmp_path / 'full'):
+        assert filecmp.cmp(tmp_path / 'full' / filename, tmp_path / 'incremental' / filename, shallow=False)
+
+    with pytest.raises(ValueError, match="merge_mode='outer'"):
+        incremental_pipeline.merge_new_months(str(tmp_path / 'spot'), str(tmp_path / 'future'), 'BENCHUSDT', 'BENCHUSDT',
+                                              str(tmp_path / 'incremental'), manifest_path, merge_mode='asof')
@@ -0,0 +1,30 @@
+import json
+import threading
+import instrumentation
+import parallel
+
+def sampler_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'rss-sampler']
+
+def test_sampler_only_runs_while_a_stage_is_open():
+    assert sampler_threads() == []
+    with instrumentation.stage('outer'):
+        with instrumentation.stage('inner'):
+            assert len(sampler_threads()) == 1
+        assert len(sampler_threads()) == 1
+    assert sampler_threads() == []
+
+def test_workers_fork_inside_a_stage():
+    with instrumentation.stage('pool'):
+        assert parallel.run_tasks(abs, [(-1,), (-2,)], max_workers=2) == [1, 2]
+    assert sampler_threads() == []
+
+def test_run_records_are_reset_after_every_written_report(tmp_path, monkeypatch):
+    monkeypatch.setenv(instrumentation.REPORT_ENV, '1')
+    for name in ('first', 'second'):
+        with instrumentation.stage(name, output_directory=str(tmp_path / name)):
+            with instrumentation.stage(f"{name}_child"):
+                pass
+    report = json.loads((tmp_path / 'second' / instrumentation.REPORT_FILENAME).read_text())
+    assert [record['name'] for record in report['stages']] == ['second_child', 'second']
+    assert len(instrumentation.report()['stages']) == 0
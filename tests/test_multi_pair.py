@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+import benchmark
+import multi_pair
+import trading_signal_analysis
+
+SYMBOLS = ['AAA', 'BBB']
+
+@pytest.fixture(scope='module')
+def processed(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('processed')
+    for seed, symbol in enumerate(SYMBOLS):
+        spot_df, future_df = benchmark.generate_prices('6h', '1s', '2023-03-31 21:00', seed=seed)
+        benchmark.write_processed_files(spot_df, future_df, str(directory / 'spot'), str(directory / 'future'), symbol=symbol)
+    return directory
+
+def aligned_reference(directory, name, grid):
+    # Last price at or before every grid timestamp, the first price before the series starts
+    df = pd.concat([pd.read_csv(path) for path in sorted(directory.glob(f"processed_{name}-aggTrades-*.csv"))])
+    prices = pd.Series(df['weighted_avg_price'].values, index=pd.to_datetime(df['timestamp']).values.astype('datetime64[ns]'))
+    prices = prices.groupby(level=0).last()
+    return prices.reindex(grid.view('datetime64[ns]'), method='ffill').bfill().values
+
+@pytest.mark.parametrize('resolution', ['1s', None])
+def test_spread_matrix_matches_pandas_alignment(processed, tmp_path, resolution):
+    multi_pair.build_spread_matrix(str(processed / 'spot'), str(processed / 'future'), SYMBOLS, SYMBOLS + ['MISSING'], [2023], [3, 4],
+                                   str(tmp_path), resolution)
+    timestamps, pairs, spreads = multi_pair.load_spread_matrix(str(tmp_path))
+    assert pairs == ['AAA-AAA', 'AAA-BBB', 'BBB-AAA', 'BBB-BBB']
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['pairs.json', 'spreads.npy', 'timestamps.npy']
+
+    grid = timestamps.view('int64')
+    for column, pair in enumerate(pairs):
+        spot_name, future_name = pair.split('-')
+        spot = aligned_reference(processed / 'spot', spot_name, grid)
+        future = aligned_reference(processed / 'future', future_name, grid)
+        np.testing.assert_array_equal(spreads[:, column], (future - spot) / spot)
+
+def test_pair_backtests_match_the_single_pair_backtest(processed, tmp_path):
+    multi_pair.build_spread_matrix(str(processed / 'spot'), str(processed / 'future'), SYMBOLS, SYMBOLS, [2023], [3, 4],
+                                   str(tmp_path / 'matrix'))
+    inline = multi_pair.backtest_all_pairs(str(tmp_path / 'matrix'), 300, 0.002, 'window', str(tmp_path / 'inline'), max_workers=1)
+    pooled = multi_pair.backtest_all_pairs(str(tmp_path / 'matrix'), 300, 0.002, 'window', max_workers=2)
+    pd.testing.assert_frame_equal(inline, pooled)
+
+    timestamps, pairs, spreads = multi_pair.load_spread_matrix(str(tmp_path / 'matrix'))
+    for column, pair in enumerate(pairs):
+        metrics = trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+            300, pd.DataFrame({'timestamp': timestamps, 'spread': np.array(spreads[:, column])}), 0.002, 'window',
+            str(tmp_path / 'single' / pair), show_plot=False, cache=False)
+        assert inline.iloc[column].drop('Pair').to_dict() == metrics
+        assert (tmp_path / 'inline' / pair / 'signal_durations_window.csv').read_bytes() == \
+               (tmp_path / 'single' / pair / 'signal_durations_window.csv').read_bytes()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pnl_backtest
+
+def synthetic_prices(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    spot = 20 * np.exp(np.cumsum(rng.normal(0, 2e-4, rows)))
+    future = spot * (1 + rng.normal(0, 1.5e-3, rows))
+    return pd.DataFrame({'timestamp': pd.date_range('2024-03-01', periods=rows, freq='15min'),
+                         'weighted_avg_price_spot': spot, 'weighted_avg_price_future': future})
+
+def test_profitable_curve_metrics():
+    timestamps = pd.date_range('2024-03-01', periods=4, freq='1D').values
+    equity = np.array([1010.0, 990.0, 1030.0, 1050.0])
+    metrics = pnl_backtest.performance_metrics(timestamps, equity, 1000.0, np.full(4, 500.0))
+
+    daily_returns = np.diff(np.r_[1000.0, equity]) / np.r_[1000.0, equity[:-1]]
+    assert np.isclose(metrics['Total Return'], 0.05)
+    assert np.isclose(metrics['Sharpe Ratio'], daily_returns.mean() / daily_returns.std(ddof=1) * np.sqrt(365))
+    assert np.isclose(metrics['Max Drawdown'], 990.0 / 1010.0 - 1)
+    assert np.isclose(metrics['Turnover'], 2.0)
+    assert metrics['Ruin Time'] is None
+
+def test_negative_equity_stops_at_ruin():
+    timestamps = pd.date_range('2024-03-01', periods=5, freq='1D').values
+    # Equity falls below zero and then "recovers" on a negative base
+    equity = np.array([500.0, -200.0, -400.0, -300.0, -100.0])
+    metrics = pnl_backtest.performance_metrics(timestamps, equity, 1000.0, np.full(5, 1000.0))
+
+    assert metrics['Total Return'] == -1.0
+    assert metrics['Max Drawdown'] == -1.0
+    assert np.isnan(metrics['Sharpe Ratio'])
+    assert metrics['Turnover'] == 2.0
+    assert metrics['Ruin Time'] == pd.Timestamp(timestamps[1])
+
+def test_ruined_backtest_is_not_ranked_as_profitable():
+    # Flipping on every small deviation pays fees and slippage until the capital is gone
+    metrics, equity_df = pnl_backtest.backtest_arbitrage_pnl(
+        5, synthetic_prices(), 2e-4, '5', capital=1000.0, leg_notional=100_000.0, spot_slippage=0.001,
+        future_slippage=0.001, first_index=5)
+
+    assert equity_df['equity'].min() < 0
+    assert metrics['Ruin Time'] is not None
+    assert metrics['Total Return'] == -1.0
+    assert metrics['Max Drawdown'] >= -1.0
+    assert not metrics['Sharpe Ratio'] > 0
@@ -0,0 +1,48 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import result_cache
+import trading_signal_analysis
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:len(data) // 2],  # truncated
+    lambda data: b'',  # empty
+    lambda data: b'not a zip file' * 10,
+    lambda data: data[:len(data) // 2] + bytes(64) + data[len(data) // 2 + 64:],  # fails its CRC check
+])
+def test_corrupt_entries_are_deleted_misses(tmp_path, corrupt):
+    cache = result_cache.ResultCache(str(tmp_path))
+    cache.put('entry', {'values': np.arange(1000.0)}, {'rows': 1000})
+    path = tmp_path / 'entry.npz'
+    path.write_bytes(corrupt(path.read_bytes()))
+
+    assert cache.get('entry') is None
+    assert not os.path.exists(path)
+    assert cache.get('missing') is None
+
+def spread_frame(rows=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'timestamp': pd.date_range('2023-03-01', periods=rows, freq='1s'),
+                         'spread': rng.normal(0.0005, 0.001, rows)})
+
+@pytest.mark.parametrize('mean_n', [60, '15min'])
+def test_cache_hits_match_uncached_backtests(tmp_path, monkeypatch, mean_n):
+    def backtest(directory, cache):
+        return trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+            mean_n, spread_frame(), 0.0015, 'window', str(tmp_path / directory), show_plot=False, cache=cache)
+
+    uncached = backtest('uncached', False)
+    miss = backtest('miss', str(tmp_path / 'cache'))
+    # A hit returns the stored signals without detecting them again
+    def no_detection(*args, **kwargs):
+        raise AssertionError('cache hit expected')
+    monkeypatch.setattr(trading_signal_analysis, 'detect_signals', no_detection)
+    hit = backtest('hit', str(tmp_path / 'cache'))
+
+    assert uncached['Trade Count'] > 0
+    assert miss == uncached
+    assert hit == uncached
+    for directory in ('miss', 'hit'):
+        assert (tmp_path / directory / 'signal_durations_window.csv').read_bytes() == \
+               (tmp_path / 'uncached' / 'signal_durations_window.csv').read_bytes()
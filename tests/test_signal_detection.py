@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+import trading_signal_analysis
+
+def reference_signals(mean_n, merged_data, threshold):
+    """
+    The original row-by-row signal loop, kept as the reference for detect_signals.
+    """
+    rolling_mean = merged_data['spread'].rolling(window=mean_n).mean().values
+    upper_bound = rolling_mean + threshold
+    lower_bound = rolling_mean - threshold
+
+    signal_start_times = np.empty(0, dtype='datetime64[ns]')
+    signal_end_times = np.empty(0, dtype='datetime64[ns]')
+    signal_durations = np.empty(0, dtype=int)
+    timestamps = merged_data['timestamp'].values
+    spreads = merged_data['spread'].values
+
+    in_signal = False
+    signal_start_index = None
+
+    for i in range(len(merged_data)):
+        if i < mean_n - 1:
+            continue
+
+        if not in_signal and (spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]):
+            in_signal = True
+            signal_start_index = i
+        elif in_signal:
+            if (spreads[i] <= upper_bound[i] and spreads[i] >= lower_bound[i]) or (spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]):
+                in_signal = False
+                signal_start_times = np.append(signal_start_times, timestamps[signal_start_index])
+                signal_end_times = np.append(signal_end_times, timestamps[i])
+                duration = (timestamps[i] - timestamps[signal_start_index]).astype('timedelta64[s]').astype(float)
+                duration = 0.5 if duration < 1 else duration
+                signal_durations = np.append(signal_durations, duration)
+                if spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]:
+                    in_signal = True
+                    signal_start_index = i
+
+    if in_signal:
+        signal_start_times = np.append(signal_start_times, timestamps[signal_start_index])
+        signal_end_times = np.append(signal_end_times, timestamps[-1])
+        duration = np.maximum((timestamps[-1] - timestamps[signal_start_index]).astype('timedelta64[s]').astype(int), 1)
+        signal_durations = np.append(signal_durations, duration)
+
+    return pd.DataFrame({'Start': signal_start_times, 'End': signal_end_times, 'Duration': signal_durations})
+
+def synthetic_spreads(seed, rows=3000, resolution='1s', nan_ratio=0.02, open_at_end=False):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range('2024-03-01', periods=rows, freq=resolution)
+    # Irregular gaps, so durations cover sub-second, whole-second and longer signals
+    timestamps = timestamps[np.sort(rng.choice(rows, size=rows * 2 // 3, replace=False))]
+    spreads = rng.normal(0.0005, 0.001, len(timestamps))
+    spreads[rng.random(len(spreads)) < nan_ratio] = np.nan
+    if open_at_end:
+        # A clean tail whose last row jumps outside the bounds leaves a signal open at the end
+        spreads[-50:] = rng.normal(0.0005, 0.001, 50)
+        spreads[-1] = 1.0
+    return pd.DataFrame({'timestamp': timestamps, 'spread': spreads})
+
+CASES = [(seed, resolution, nan_ratio, open_at_end)
+         for seed, (resolution, nan_ratio, open_at_end) in enumerate([
+             ('1s', 0.0, False), ('1s', 0.02, False), ('1s', 0.02, True),
+             ('500ms', 0.0, False), ('500ms', 0.05, True), ('200ms', 0.1, False)])]
+
+@pytest.mark.parametrize('seed, resolution, nan_ratio, open_at_end', CASES)
+@pytest.mark.parametrize('mean_n, threshold', [(5, 0.0008), (20, 0.0015)])
+def test_signal_csv_matches_reference_loop(tmp_path, seed, resolution, nan_ratio, open_at_end, mean_n, threshold):
+    merged_data = synthetic_spreads(seed, resolution=resolution, nan_ratio=nan_ratio, open_at_end=open_at_end)
+    expected_path = tmp_path / 'expected.csv'
+    reference_signals(mean_n, merged_data, threshold).to_csv(expected_path, index=False)
+
+    trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+        mean_n, merged_data.copy(), threshold, 'window', str(tmp_path), show_plot=False, cache=False)
+
+    assert (tmp_path / 'signal_durations_window.csv').read_bytes() == expected_path.read_bytes()
+
+def test_open_signal_is_reported():
+    merged_data = synthetic_spreads(0, open_at_end=True)
+    rolling_mean = merged_data['spread'].rolling(window=20).mean().values
+    *_, signal_open = trading_signal_analysis.detect_signals(
+        merged_data['timestamp'].values, merged_data['spread'].values, rolling_mean + 0.0008, rolling_mean - 0.0008, 19, return_open=True)
+    assert signal_open
+
+def test_no_signals_give_the_full_metrics(tmp_path):
+    merged_data = synthetic_spreads(0, nan_ratio=0.0)
+    metrics = trading_signal_analysis.modified_optimized_backtest_arbitrage_strategy(
+        20, merged_data, 1.0, 'window', str(tmp_path), show_plot=False, cache=False)
+
+    expected = trading_signal_analysis.calculate_trade_durations_statistics(np.array([1.0]), 'window', 1.0)
+    assert metrics.keys() == expected.keys()
+    assert metrics['Trade Count'] == 0 and metrics['Trades in 2-5 secs'] == 0
+    assert np.isnan(metrics['Mean Duration (seconds)'])
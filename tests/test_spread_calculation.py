@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+import data_cleaning
+
+def write_merged_month(directory, start, periods, freq, seed):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=periods, freq=freq)
+    spot = 20 + np.cumsum(rng.normal(0, 0.01, periods))
+    future = spot * (1 + rng.normal(0, 1e-3, periods))
+    spot[rng.random(periods) < 0.05] = np.nan
+    month_df = pd.DataFrame({'timestamp': timestamps, 'weighted_avg_price_spot': spot, 'weighted_avg_price_future': future})
+    # One to_csv call per month, like save_merged_data
+    month_df.to_csv(directory / f"SPOT-FUT-{timestamps[0]:%Y-%m}.csv", index=False)
+
+@pytest.mark.parametrize('months', [
+    [('2023-03-31 23:50', 600, '1s'), ('2023-04-01', 600, '1s')],
+    [('2023-03-31 23:50', 600, '1s'), ('2023-04-01', 1200, '500ms')],
+    [('2023-03-31 23:50', 600, '250ms'), ('2023-04-01', 600, '1s')],
+    [('2023-02-28', 5, '1D'), ('2023-03-31 23:50', 600, '1s'), ('2023-04-01', 300, '1ms')],
+])
+@pytest.mark.parametrize('chunksize', [97, 1_000_000])
+def test_streaming_spread_file_matches_in_memory(tmp_path, months, chunksize):
+    merged_directory = tmp_path / 'merged'
+    merged_directory.mkdir()
+    for seed, (start, periods, freq) in enumerate(months):
+        write_merged_month(merged_directory, start, periods, freq, seed)
+    in_memory, streaming = tmp_path / 'in_memory', tmp_path / 'streaming'
+    in_memory.mkdir()
+    streaming.mkdir()
+
+    data_cleaning.calculate_spread(str(merged_directory), 'SPOT', 'FUT', str(in_memory), streaming=False)
+    data_cleaning.calculate_spread(str(merged_directory), 'SPOT', 'FUT', str(streaming), chunksize=chunksize)
+
+    assert (streaming / 'spreads_SPOT_FUT.csv').read_bytes() == (in_memory / 'spreads_SPOT_FUT.csv').read_bytes()
+
+def test_timestamp_unit_follows_to_csv():
+    timestamps = pd.to_datetime(['2023-03-31', '2023-04-01']).values
+    assert data_cleaning.timestamp_unit(timestamps) == 'D'
+    assert data_cleaning.timestamp_unit(timestamps + np.timedelta64(1, 's')) == 's'
+    assert data_cleaning.timestamp_unit(timestamps + np.timedelta64(5, 'ms')) == 'ms'
+    assert data_cleaning.timestamp_unit(timestamps, unit='us') == 'us'
+    assert list(data_cleaning.format_timestamps(timestamps + np.timedelta64(500, 'ms'), 'ms')) == [
+        '2023-03-31 00:00:00.500', '2023-04-01 00:00:00.500']
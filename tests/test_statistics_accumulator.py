@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statistics_accumulator
+import trading_signal_analysis
+
+def write_partitions(directory, seed=0, months=3):
+    rng = np.random.default_rng(seed)
+    spread_files, signal_files, spreads, durations, starts = [], [], [], [], []
+    for month in range(1, months + 1):
+        month_spreads = rng.normal(0.0005, 0.001, 5000)
+        month_spreads[rng.random(5000) < 0.01] = np.nan
+        month_starts = np.sort(pd.Timestamp(f"2023-{month:02d}-01").to_datetime64() + rng.integers(0, 28 * 86400, 400).astype('timedelta64[s]'))
+        month_durations = rng.choice([0.5, 1.0, 2.0, 3.0, 7.0, 12.0, 60.0], 400)
+        spread_files.append(directory / f"spreads-{month}.csv")
+        signal_files.append(directory / f"signals-{month}.csv")
+        pd.DataFrame({'spread': month_spreads}).to_csv(spread_files[-1], index=False)
+        pd.DataFrame({'Start': month_starts, 'End': month_starts, 'Duration': month_durations}).to_csv(signal_files[-1], index=False)
+        # The reference reads the file back, as the accumulator does
+        spreads.append(pd.read_csv(spread_files[-1])['spread'].values)
+        durations.append(month_durations)
+        starts.append(month_starts)
+    return [str(path) for path in spread_files], [str(path) for path in signal_files], \
+        np.concatenate(spreads), np.concatenate(durations), np.concatenate(starts)
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_merged_partitions_match_whole_data_statistics(tmp_path, max_workers):
+    spread_files, signal_files, spreads, durations, starts = write_partitions(tmp_path)
+    accumulator = statistics_accumulator.accumulate_partitions(spread_files, signal_files, max_workers=max_workers, chunksize=1000)
+
+    valid = spreads[~np.isnan(spreads)]
+    stats = accumulator.spread_statistics()
+    assert stats['total_count'] == len(valid)
+    assert stats['mean_spread'] == pytest.approx(valid.mean(), rel=1e-12)
+    assert stats['std_spread'] == pytest.approx(valid.std(), rel=1e-12)
+    assert (stats['min_spread'], stats['max_spread']) == (valid.min(), valid.max())
+    # The sketch keeps quantiles within its relative accuracy of 0.01
+    assert stats['median_spread'] == pytest.approx(np.median(valid), rel=0.011)
+    for q in (0.05, 0.95):
+        assert stats[f"q{q:g}_spread"] == pytest.approx(np.quantile(valid, q), rel=0.011)
+
+    expected = trading_signal_analysis.calculate_trade_durations_statistics(durations, 'window', 0.001)
+    actual = accumulator.duration_statistics('window', 0.001)
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert actual[name] == (pytest.approx(value, rel=1e-12) if isinstance(value, float) else value)
+
+    density = accumulator.signal_density()
+    expected_density = pd.Series(1, index=pd.to_datetime(starts)).groupby(pd.to_datetime(starts).floor('1D')).sum()
+    np.testing.assert_array_equal(density.values, expected_density.values)
+    assert list(density.index) == list(expected_density.index)
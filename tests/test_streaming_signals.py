@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rolling_statistics
+import holding_position_analysis
+import streaming_signals
+import trading_signal_analysis
+
+# StreamingSignal repeats the arithmetic of pandas' rolling mean value by value. These tests
+# pin that parity, so a change of the pandas kernel fails here instead of silently making
+# the live and batch decisions diverge.
+
+def spread_series(seed, rows=5000):
+    rng = np.random.default_rng(seed)
+    spreads = rng.normal(0.0005, 0.001, rows)
+    # Runs of identical values, a single-signed stretch, large magnitudes and NaN gaps
+    spreads[1000:1200] = 0.0007
+    spreads[2000:2500] = np.abs(spreads[2000:2500]) + 1e-3
+    spreads[3000:3010] = 1e6
+    spreads[rng.random(rows) < 0.01] = np.nan
+    return spreads
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('window', [1, 7, 60])
+def test_rolling_mean_matches_pandas_bit_for_bit(seed, window):
+    spreads = spread_series(seed)
+    expected = pd.Series(spreads).rolling(window=window).mean().values
+
+    rolling_mean = rolling_statistics.RollingMean(window)
+    streamed = np.array([rolling_mean.push(value) for value in spreads.tolist()])
+
+    np.testing.assert_array_equal(streamed, expected)
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('window', [1, 7, 60])
+def test_trailing_mean_matches_batch_bit_for_bit(seed, window):
+    spreads = spread_series(seed)
+    expected = rolling_statistics.trailing_mean(spreads, window)
+
+    trailing_mean = rolling_statistics.TrailingMean(window)
+    streamed = np.array([trailing_mean.push(value) for value in spreads.tolist()])
+
+    np.testing.assert_array_equal(streamed, expected)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_replay_matches_batch_backtests(seed):
+    spreads = spread_series(seed)
+    merged_data = pd.DataFrame({'timestamp': pd.date_range('2024-03-01', periods=len(spreads), freq='700ms'), 'spread': spreads})
+    mean_n, threshold, warm_up = 30, 0.0012, 100
+
+    signals_df, entries_df = streaming_signals.replay_frame(merged_data, mean_n, threshold, position_warm_up=warm_up)
+
+    timestamps = merged_data['timestamp'].values.astype('datetime64[ns]')
+    rolling_mean = merged_data['spread'].rolling(window=mean_n).mean().values
+    start, end, duration = trading_signal_analysis.detect_signals(
+        timestamps, spreads, rolling_mean + threshold, rolling_mean - threshold, mean_n - 1)
+    pd.testing.assert_frame_equal(signals_df, pd.DataFrame({'Start': start, 'End': end, 'Duration': duration}))
+
+    mean_min = rolling_statistics.trailing_mean(spreads, mean_n)
+    entry_indices, positions = holding_position_analysis.detect_position_flips(spreads, mean_min, threshold, warm_up)
+    np.testing.assert_array_equal(entries_df['timestamp'].values, timestamps[entry_indices])
+    np.testing.assert_array_equal(entries_df['position'].values, positions)
+
+def test_time_windows_are_rejected():
+    with pytest.raises(ValueError, match='number of rows'):
+        streaming_signals.StreamingSignal('15min', 0.001)
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+import walk_forward
+
+def synthetic_spreads(seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range('2023-01-01', '2023-04-30 23:59', freq='1min')
+    return pd.DataFrame({'timestamp': timestamps, 'spread': rng.normal(0, 1e-3, len(timestamps))})
+
+def test_folds_match_between_inline_and_pooled_runs():
+    spreads = synthetic_spreads()
+    arguments = (spreads, [30, (60, '60 rows'), '2h'], [5e-4, 1e-3, 2e-3], 'Mean Duration (seconds)')
+    inline = walk_forward.walk_forward(*arguments, train_months=2, maximize=False, max_workers=1)
+    pooled = walk_forward.walk_forward(*arguments, train_months=2, maximize=False, max_workers=2)
+    pd.testing.assert_frame_equal(inline, pooled)
+    assert list(inline['Test Month']) == ['2023-03', '2023-04']
+
+def test_ties_go_to_the_shortest_window_then_the_smallest_threshold():
+    # No threshold this wide is ever crossed, so every candidate scores zero signals
+    folds = walk_forward.walk_forward(synthetic_spreads(), ['1h', 90, 30], [1.0, 0.5], 'Trade Count', min_trades=0, max_workers=1)
+    assert list(folds['Rolling Mean Window']) == [30]
+    assert list(folds['Spread Threshold']) == [0.5]
+
+def test_unknown_objectives_are_rejected():
+    with pytest.raises(ValueError, match='Unknown objective'):
+        walk_forward.walk_forward(synthetic_spreads(), [30], [1e-3], 'Sharpe', max_workers=1)
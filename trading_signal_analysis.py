@@ -1,84 +1,207 @@
 import os
+import shutil
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
-import gc
-import matplotlib.pyplot as plt
+import storage
+import rolling_statistics
+import reporting
+import instrumentation
+import result_cache
 
-def modified_optimized_backtest_arbitrage_strategy(mean_n, merged_data, threshold, rolling_mean_window, dump_file_directory):
+@instrumentation.instrumented('signal_backtest', 'dump_file_directory')
+def modified_optimized_backtest_arbitrage_strategy(mean_n, merged_data, threshold, rolling_mean_window, dump_file_directory, storage_format='csv', show_plot=True, plot_path=None,
+                                                   cache=None):
     # Convert 'timestamp' to datetime format if not already done
     if not pd.api.types.is_datetime64_any_dtype(merged_data['timestamp']):
         merged_data['timestamp'] = pd.to_datetime(merged_data['timestamp'])
 
-    # Pre-calculate rolling statistics for efficiency
-    rolling_mean = merged_data['spread'].rolling(window=mean_n).mean().values
-    # rolling_std = merged_data['spread'].rolling(window=mean_n).std().values
-    upper_bound = rolling_mean + threshold
-    lower_bound = rolling_mean - threshold
-
-    # Initialize numpy arrays for efficiency
-    signal_start_times = np.empty(0, dtype='datetime64[ns]')
-    signal_end_times = np.empty(0, dtype='datetime64[ns]')
-    signal_durations = np.empty(0, dtype=int)
     timestamps = merged_data['timestamp'].values
     spreads = merged_data['spread'].values
+    instrumentation.add_rows(len(spreads))
 
-    in_signal = False
-    signal_start_index = None
-
-    for i in tqdm(range(len(merged_data))):
-        if i < mean_n - 1:  # Skip the initial window where rolling stats aren't available
-            continue
-
-        # Check if current spread crosses the bounds
-        if not in_signal and (spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]):
-            in_signal = True
-            signal_start_index = i
-        elif in_signal:
-            # If in a signal, check if it continues or a new one starts within the same second
-            if (spreads[i] <= upper_bound[i] and spreads[i] >= lower_bound[i]) or (spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]):
-                in_signal = False
-                signal_start_times = np.append(signal_start_times, timestamps[signal_start_index])
-                signal_end_times = np.append(signal_end_times, timestamps[i])
-                duration = (timestamps[i] - timestamps[signal_start_index]).astype('timedelta64[s]').astype(float)
-                duration = 0.5 if duration < 1 else duration  # Mark durations within 1 second as 0.5
-                signal_durations = np.append(signal_durations, duration)
-                if spreads[i] > upper_bound[i] or spreads[i] < lower_bound[i]:
-                    # If a new signal starts at the current timestamp, update the start index
-                    in_signal = True
-                    signal_start_index = i
+    # Rolling means and signal tables of data already seen come from the result cache
+    cache = result_cache.resolve(cache)
+    cached_signals = data_fingerprint = signals_key = None
+    if cache is not None:
+        data_fingerprint = result_cache.fingerprint(timestamps.astype('datetime64[ns]'), spreads.astype(float))
+        signals_key = result_cache.cache_key('signals', data_fingerprint, mean_n=mean_n, threshold=threshold)
+        cached_signals = cache.get(signals_key)
 
-    # Handle the case where a signal is still active at the end
-    if in_signal:
-        signal_start_times = np.append(signal_start_times, timestamps[signal_start_index])
-        signal_end_times = np.append(signal_end_times, timestamps[-1])
-        duration = np.maximum((timestamps[-1] - timestamps[signal_start_index]).astype('timedelta64[s]').astype(int), 1)  # Ensure minimum duration of 1s
-        signal_durations = np.append(signal_durations, duration)
+    if cached_signals is not None:
+        arrays, metadata = cached_signals
+        signal_start_times, signal_end_times, signal_durations = arrays['start'], arrays['end'], arrays['duration']
+        metrics = dict(metadata['metrics'], **{'Rolling Mean Window': rolling_mean_window})
+    else:
+        # Pre-calculate rolling statistics for efficiency
+        rolling_mean = _rolling_mean(merged_data, timestamps, spreads, mean_n, cache, data_fingerprint)
+        # rolling_std = merged_data['spread'].rolling(window=mean_n).std().values
+        upper_bound = rolling_mean + threshold
+        lower_bound = rolling_mean - threshold
+
+        # Locate every signal with array operations instead of a per-row loop
+        first_index = rolling_statistics.first_full_window(timestamps, mean_n)
+        signal_start_times, signal_end_times, signal_durations = detect_signals(timestamps, spreads, upper_bound, lower_bound, first_index)
+        metrics = None
 
     # Ensure the directory exists
     check_create_directory(dump_file_directory)
     
-    # Define the file path with a specific file name
-    output_file_path = os.path.join(dump_file_directory, f"signal_durations_{rolling_mean_window}.csv")
-    
     # Convert signal start and end times to a DataFrame
     signals_df = pd.DataFrame({'Start': signal_start_times, 'End': signal_end_times, 'Duration': signal_durations})
-    
-    # Save to a CSV file with the specified path
-    signals_df.to_csv(output_file_path, index=False)
 
-    # Force garbage collection
-    gc.collect()
+    if storage_format == 'csv':
+        # Define the file path with a specific file name
+        output_file_path = os.path.join(dump_file_directory, f"signal_durations_{rolling_mean_window}.csv")
+
+        # Save to a CSV file with the specified path, unless it is the untouched file written with the cached signals
+        output_state = _file_state(output_file_path)
+        if cached_signals is None or output_state is None or output_state != cached_signals[1]['output'].get(output_file_path):
+            signals_df.to_csv(output_file_path, index=False)
+    else:
+        # Save into the columnar storage layer, partitioned by the month of the signal start.
+        # Months of an earlier run are removed first, like the CSV file is overwritten
+        signals_name = f"signal_durations_{rolling_mean_window}"
+        shutil.rmtree(os.path.join(dump_file_directory, f"pair={signals_name}"), ignore_errors=True)
+        storage.write_frame(signals_df, dump_file_directory, signals_name, storage_format,
+                            time_column='Start', datetime_columns=['End'])
+
+    # Collect garbage only when the memory growth calls for it
+    instrumentation.collect_garbage('signal_backtest: signals saved')
 
     # Calculate statistics for signal durations
-    metrics = calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+    if metrics is None:
+        metrics = calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+        if cache is not None:
+            output = {output_file_path: _file_state(output_file_path)} if storage_format == 'csv' else {}
+            cache.put(signals_key, {'start': signal_start_times, 'end': signal_end_times, 'duration': signal_durations},
+                      {'metrics': metrics, 'output': output})
 
     # Analyze statistics
-    analyze_trade_durations(signal_durations)
+    if show_plot or plot_path:
+        analyze_trade_durations(signal_durations, output_path=plot_path, show=show_plot)
 
     return metrics
 
+def _file_state(path):
+    # Size and modification time identify a file this function wrote and nobody changed since
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _rolling_mean(merged_data, timestamps, spreads, mean_n, cache=None, data_fingerprint=None):
+    key = None
+    if cache is not None:
+        key = result_cache.cache_key('rolling_mean', data_fingerprint, mean_n=mean_n)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached[0]['rolling_mean']
+
+    if rolling_statistics.is_time_window(mean_n):
+        # A duration like '15min' covers the rows of the last 15 minutes, however many there are
+        rolling_mean = rolling_statistics.time_rolling_mean(timestamps, spreads, mean_n)
+    else:
+        # All rows at once rather than through streaming_signals.StreamingSignal's RollingMean;
+        # the two give identical means, as tests/test_streaming_signals.py checks
+        rolling_mean = merged_data['spread'].rolling(window=mean_n).mean().values
+
+    if cache is not None:
+        cache.put(key, {'rolling_mean': rolling_mean})
+    return rolling_mean
+
+def detect_signals(timestamps, spreads, upper_bound, lower_bound, first_index, return_open=False):
+    """
+    Find the start time, end time and duration of every trading signal.
+
+    A signal starts on any row whose spread is outside the bounds and is closed by the
+    next row whose spread can be compared with the bounds. If that row is outside the
+    bounds as well, a new signal starts on it. This is the same state machine as the
+    original row-by-row loop, evaluated with array operations.
+
+    Parameters:
+    - timestamps: datetime64 array of row timestamps.
+    - spreads: Array of spread values.
+    - upper_bound: Array with the upper bound of every row.
+    - lower_bound: Array with the lower bound of every row.
+    - first_index: First row to consider (rows before it are the rolling window warm-up).
+    - return_open: Also return whether the last signal is still open at the end of the data.
+
+    Returns:
+    - A tuple of (signal_start_times, signal_end_times, signal_durations) arrays,
+      followed by the open flag if return_open is set.
+    """
+    first_index = max(first_index, 0)
+    spreads = spreads[first_index:]
+    upper_bound = upper_bound[first_index:]
+    lower_bound = lower_bound[first_index:]
+
+    # Rows outside the bounds open a signal; rows with a valid comparison close the open one
+    outside = (spreads > upper_bound) | (spreads < lower_bound)
+    decided = outside | ((spreads <= upper_bound) & (spreads >= lower_bound))
+    start_indices = np.flatnonzero(outside) + first_index
+    decided_indices = np.flatnonzero(decided) + first_index
+    del outside, decided
+
+    # Every signal ends on the first decided row after its start
+    end_positions = np.searchsorted(decided_indices, start_indices, side='right')
+    closed = end_positions < len(decided_indices)
+    closed_start_indices = start_indices[closed]
+    closed_end_indices = decided_indices[end_positions[closed]]
+
+    signal_start_times = timestamps[closed_start_indices].astype('datetime64[ns]')
+    signal_end_times = timestamps[closed_end_indices].astype('datetime64[ns]')
+    signal_durations = (timestamps[closed_end_indices] - timestamps[closed_start_indices]).astype('timedelta64[s]').astype(float)
+    signal_durations[signal_durations < 1] = 0.5  # Mark durations within 1 second as 0.5
+    if len(signal_durations) == 0:
+        signal_durations = np.empty(0, dtype=int)
+
+    # Handle the case where a signal is still active at the end
+    signal_open = not closed.all()
+    if signal_open:
+        open_start_index = start_indices[-1]
+        duration = np.maximum((timestamps[-1] - timestamps[open_start_index]).astype('timedelta64[s]').astype(int), 1)  # Ensure minimum duration of 1s
+        signal_start_times = np.append(signal_start_times, timestamps[open_start_index])
+        signal_end_times = np.append(signal_end_times, timestamps[-1])
+        signal_durations = np.append(signal_durations, duration)
+
+    if return_open:
+        return signal_start_times, signal_end_times, signal_durations, signal_open
+    return signal_start_times, signal_end_times, signal_durations
+
+def check_create_directory(directory_path):
+    """
+    Checks if a specified directory exists, and if not, creates it.
+
+    Parameters:
+    - directory_path: The path of the directory to check and possibly create.
+    """
+    # Check if the directory exists
+    if not os.path.exists(directory_path):
+        # If it does not exist, create the directory
+        os.makedirs(directory_path)
+        print(f"Directory '{directory_path}' was created.")
+    else:
+        print(f"Directory '{directory_path}' already exists.")
+
 def calculate_trade_durations_statistics(trade_durations, rolling_mean_window, threshold):
+    trade_durations = np.asarray(trade_durations)
+    if len(trade_durations) == 0:
+        # No signals: the same metrics, with counts of zero and undefined durations
+        return {
+            'Rolling Mean Window': rolling_mean_window,
+            'Spread Threshold': threshold,
+            'Trade Count': 0,
+            'Mean Duration (seconds)': np.nan,
+            'Median Duration (seconds)': np.nan,
+            'Standard Deviation': np.nan,
+            'Max Duration (seconds)': np.nan,
+            'Min Duration (seconds)': np.nan,
+            'Trades whithin 1 sec': 0,
+            'Trades in 1 sec': 0,
+            'Trades in 2-5 secs': 0,
+            'Trades within 10 secs': 0
+        }
+
     # Calculating statistics
     mean_duration = np.mean(trade_durations)
     median_duration = np.median(trade_durations)
@@ -107,18 +230,9 @@ def calculate_trade_durations_statistics(trade_durations, rolling_mean_window, t
         'Trades within 10 secs': trades_within_10_secs
     }
 
-def analyze_trade_durations(trade_durations):
-    # Plot histogram
-    plt.figure(figsize=(10, 6))
-    counts, bins, patches = plt.hist(trade_durations, bins='auto', color='skyblue', alpha=0.7, rwidth=0.85)
-    
-    # Annotate histogram bars
-    for patch in patches:
-        height = patch.get_height()
-        plt.annotate(f'{int(height)}', xy=(patch.get_x() + patch.get_width() / 2, height), 
-                     xytext=(0, 5), textcoords='offset points', ha='center', va='bottom')
-    
-    plt.title('Histogram of Trade Durations')
-    plt.xlabel('Duration (seconds)')
-    plt.ylabel('Number of Trades')
-    plt.show()
\ No newline at end of file
+def analyze_trade_durations(trade_durations, output_path=None, show=True):
+    # Histogram bins and counts are computed once; rendering is left to the reporting layer
+    hist = reporting.histogram(trade_durations, bins='auto')
+    reporting.render_histogram(hist, 'Histogram of Trade Durations', 'Duration (seconds)', 'Number of Trades',
+                               output_path=output_path, show=show, color='skyblue')
+    return hist
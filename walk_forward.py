@@ -0,0 +1,172 @@
+import os
+import tempfile
+import pandas as pd
+import numpy as np
+import rolling_statistics
+import trading_signal_analysis
+import data_cleaning
+import parallel
+
+def load_spreads(merged_directory, spot_name, future_name):
+    """
+    Spread of a pair computed from its monthly merged files, in chronological order.
+    """
+    frames = []
+    for csv_file in data_cleaning.merged_files_in_order(merged_directory, spot_name, future_name):
+        df = pd.read_csv(csv_file, usecols=['timestamp', 'weighted_avg_price_spot', 'weighted_avg_price_future'])
+        spot, future = df['weighted_avg_price_spot'].values, df['weighted_avg_price_future'].values
+        # (future - spot) / spot
+        frames.append(pd.DataFrame({'timestamp': pd.to_datetime(df['timestamp']).values, 'spread': (future - spot) / spot}))
+        print(f"Read file: {csv_file}")
+    if not frames:
+        return pd.DataFrame({'timestamp': pd.to_datetime([]), 'spread': np.empty(0)})
+    return pd.concat(frames, ignore_index=True)
+
+def month_bounds(timestamps):
+    """
+    Row range of every calendar month of sorted timestamps.
+
+    Returns:
+    - A list of ('YYYY-MM', first_row, end_row) tuples.
+    """
+    months = np.asarray(timestamps).astype('datetime64[M]')
+    if len(months) == 0:
+        return []
+    starts = np.r_[0, np.flatnonzero(months[1:] != months[:-1]) + 1]
+    ends = np.r_[starts[1:], len(months)]
+    return [(str(months[start]), int(start), int(end)) for start, end in zip(starts, ends)]
+
+def _window_filename(window):
+    return f"rolling_mean_{str(window).replace(' ', '_')}.npy"
+
+def precompute_rolling_means(timestamps, spreads, windows, directory):
+    """
+    Rolling mean of the whole history for every window, written to .npy files.
+
+    The means run across month boundaries, so every fold starts with a warm window built
+    from the rows before it and no fold recomputes it. Each mean only looks back, so the
+    test months never see later data.
+
+    Returns:
+    - A dictionary of window to .npy path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for window in windows:
+        if rolling_statistics.is_time_window(window):
+            rolling_mean = rolling_statistics.time_rolling_mean(timestamps, spreads, window)
+        else:
+            rolling_mean = pd.Series(spreads).rolling(window=window).mean().values
+        paths[window] = os.path.join(directory, _window_filename(window))
+        np.save(paths[window], rolling_mean)
+    return paths
+
+def _init_worker(timestamps, spreads, rolling_mean_paths):
+    # History and rolling means shared by every fold
+    parallel.shared['timestamps'] = timestamps
+    parallel.shared['spreads'] = spreads
+    # Memory-mapped, so all workers read the same pages instead of holding a copy each
+    parallel.shared['rolling_means'] = {window: np.load(path, mmap_mode='r') for window, path in rolling_mean_paths.items()}
+    parallel.shared['first_rows'] = {window: rolling_statistics.first_full_window(timestamps, window) for window in rolling_mean_paths}
+
+def _evaluate(window, rolling_mean_window, threshold, start, end):
+    """
+    Signal metrics of one (window, threshold) on the rows [start, end).
+    """
+    rolling_mean = np.asarray(parallel.shared['rolling_means'][window][start:end])
+    _, _, signal_durations = trading_signal_analysis.detect_signals(
+        parallel.shared['timestamps'][start:end], parallel.shared['spreads'][start:end], rolling_mean + threshold, rolling_mean - threshold,
+        parallel.shared['first_rows'][window] - start)
+    return trading_signal_analysis.calculate_trade_durations_statistics(signal_durations, rolling_mean_window, threshold)
+
+def _window_order(window):
+    # Row-count windows come before durations, each kind ordered by its length
+    if rolling_statistics.is_time_window(window):
+        return (1, pd.Timedelta(window).value)
+    return (0, window)
+
+def _run_fold(fold, windows, thresholds, objective, maximize, min_trades):
+    train_start, train_end = fold['train_rows']
+    candidates = []
+    for window, rolling_mean_window in windows:
+        for threshold in thresholds:
+            metrics = _evaluate(window, rolling_mean_window, threshold, train_start, train_end)
+            if metrics['Trade Count'] < min_trades or np.isnan(metrics[objective]):
+                continue
+            score = metrics[objective]
+            # Ties on the objective go to the shortest window, then to the smallest threshold
+            rank = (-score if maximize else score, _window_order(window), threshold)
+            candidates.append((rank, (window, rolling_mean_window, threshold), score))
+    best, best_score = None, None
+    if candidates:
+        _, best, best_score = min(candidates, key=lambda candidate: candidate[0])
+
+    result = {'Train Months': fold['train_months'], 'Test Month': fold['test_month']}
+    if best is None:
+        return result
+    window, rolling_mean_window, threshold = best
+    test_metrics = _evaluate(window, rolling_mean_window, threshold, *fold['test_rows'])
+    result.update({'Rolling Mean Window': rolling_mean_window, 'Spread Threshold': threshold, f"Train {objective}": best_score})
+    result.update({f"Test {name}": value for name, value in test_metrics.items() if name not in ('Rolling Mean Window', 'Spread Threshold')})
+    return result
+
+def walk_forward(spreads, windows, thresholds, objective, train_months=3, expanding=False, maximize=True,
+                 min_trades=1, max_workers=None, work_directory=None):
+    """
+    Walk-forward evaluation of the trading signal strategy over calendar months.
+
+    Every fold picks the (window, threshold) with the best training metric out of
+    calculate_trade_durations_statistics on `train_months` months, then evaluates it on the
+    following month. Rolling means are computed once for the whole history and shared by
+    all folds, and the folds run in parallel processes.
+
+    There is no default objective: the signal metrics count and time signals, and which of
+    them makes a parameter set better (e.g. the most short-lived signals, or the shortest
+    mean duration) is the caller's choice. Parameters tied on the objective are ranked by
+    window length, shortest first (row-count windows before durations), then by threshold,
+    smallest first.
+
+    Parameters:
+    - spreads: DataFrame with 'timestamp' and 'spread' columns (see load_spreads).
+    - windows: Rolling mean windows in rows or as durations, plain or as
+               (mean_n, rolling_mean_window) tuples like the notebook's means_list.
+    - thresholds: Spread thresholds.
+    - objective: Metric of calculate_trade_durations_statistics that ranks the parameters,
+                 e.g. 'Trades in 2-5 secs' or 'Mean Duration (seconds)'.
+    - train_months: Number of months in the training span.
+    - expanding: Train on every month before the test month instead of the last train_months.
+    - maximize: Pick the largest objective, or the smallest if False.
+    - min_trades: Parameters with fewer training signals are not considered.
+    - max_workers: Number of worker processes. Defaults to the number of cores;
+                   1 runs the folds in the current process.
+    - work_directory: Directory for the precomputed rolling means; a temporary one by default.
+
+    Returns:
+    - A DataFrame with one row per fold: the training months, the test month, the chosen
+      parameters, their training score and their test metrics.
+    """
+    metric_names = set(trading_signal_analysis.calculate_trade_durations_statistics(np.empty(0), None, None)) - {'Rolling Mean Window', 'Spread Threshold'}
+    if objective not in metric_names:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {sorted(metric_names)}")
+    windows = [window if isinstance(window, tuple) else (window, window) for window in windows]
+    timestamps = spreads['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+    timestamps = timestamps.values
+    spread_values = spreads['spread'].values.astype(float)
+
+    months = month_bounds(timestamps)
+    folds = []
+    for test in range(train_months, len(months)):
+        first = 0 if expanding else test - train_months
+        folds.append({'train_months': f"{months[first][0]}..{months[test - 1][0]}", 'test_month': months[test][0],
+                      'train_rows': (months[first][1], months[test - 1][2]), 'test_rows': (months[test][1], months[test][2])})
+    if not folds:
+        return pd.DataFrame()
+
+    with tempfile.TemporaryDirectory(dir=work_directory) as directory:
+        paths = precompute_rolling_means(timestamps, spread_values, [window for window, _ in windows], directory)
+        arguments = (windows, thresholds, objective, maximize, min_trades)
+        results = parallel.run_tasks(_run_fold, [(fold,) + arguments for fold in folds], max_workers, _init_worker,
+                                     (timestamps, spread_values, paths))
+    return pd.DataFrame(results)